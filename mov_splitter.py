@@ -40,29 +40,107 @@
 """
 
 # Imports
+import array
 import calendar
+import ctypes
+import ctypes.util
 import datetime
+import errno
 import getopt
 import glob
+import hashlib
+import heapq
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
 import Queue
 import shutil
 import signal
+import sqlite3
 import string
+import struct
 import sys
 import threading
 import time
 from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
 from datetime import datetime
 from functools import wraps
 
 import exifread
 
+# C library kernel copy functions (zero-copy extraction), None when not available
+COPY_FILE_RANGE = None
+SENDFILE        = None
+
+try:
+    LIBC = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+    # ssize_t copy_file_range(int fd_in, loff_t *off_in, int fd_out, loff_t *off_out, size_t len, unsigned int flags)
+    if hasattr(LIBC, 'copy_file_range'):
+        COPY_FILE_RANGE = LIBC.copy_file_range
+        COPY_FILE_RANGE.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_int64), ctypes.c_int, ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t, ctypes.c_uint]
+        COPY_FILE_RANGE.restype = ctypes.c_ssize_t
+
+    # ssize_t sendfile64(int out_fd, int in_fd, off64_t *offset, size_t count)
+    if hasattr(LIBC, 'sendfile64'):
+        SENDFILE = LIBC.sendfile64
+        SENDFILE.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+        SENDFILE.restype = ctypes.c_ssize_t
+except OSError:
+    pass
+
+# Optional NumPy support (batch GPS conversions)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Global variables
-QUEUE_Done     = 0
-QUEUE_Count    = 0
-QUEUE_Slots    = []
 CAMERA_MODULES = 9
+EPOCH_Cache    = {}
+
+# EXIF tags read by the fast EXIF reader
+EXIF_Tags_IFD0 = {0x0132: 'Image DateTime'}
+EXIF_Tags_EXIF = {0x9291: 'EXIF SubSecTimeOriginal'}
+EXIF_Tags_GPS  = {
+    0x0001: 'GPS GPSLatitudeRef',
+    0x0002: 'GPS GPSLatitude',
+    0x0003: 'GPS GPSLongitudeRef',
+    0x0004: 'GPS GPSLongitude',
+    0x0005: 'GPS GPSAltitudeRef',
+    0x0006: 'GPS GPSAltitude',
+    0x0011: 'GPS GPSImgDirection',
+    0x0013: 'GPS GPSDestLatitudeRef',
+    0x0014: 'GPS GPSDestLatitude',
+    0x0015: 'GPS GPSDestLongitudeRef',
+    0x0016: 'GPS GPSDestLongitude'
+}
+
+# GPS row of images captured without GPS data, tells them apart from images not captured
+GPS_Missing = ()
+
+# Frames index sidecar file format (header, then one record per frame)
+INDEX_Magic  = 'MOVIDX03'
+INDEX_Header = '<8sQdI'
+INDEX_Record = '<QIqIBB'
+
+# Packed images file format, header (magic, images count, index offset) then images,
+#  index records (epoch, microseconds, module, offset, size) sorted by timestamp and module at the end
+PACK_Magic  = 'JP4PACK1'
+PACK_Header = '<8sQQ'
+PACK_Record = '<qIBQQ'
+
+# Maximum bytes searched backward for a JPEG end of image marker when trimming scanned frames
+EOI_Window = 64 * 1024
+
+# Bytes checked by the scanner for each JPEG header (markers, APP1 length, EXIF signature, TIFF byte order)
+SCAN_Header = 16
+
+# EXIF field types sizes (BYTE, ASCII, SHORT, LONG, RATIONAL)
+EXIF_Types = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8}
 
 # KML file header
 KML_Header = \
@@ -92,29 +170,82 @@ KML_Footer = \
 """</Document>
 </kml>"""
 
+# GeoJSON file header
+GEOJSON_Header = \
+"""{"type": "FeatureCollection", "features": [
+"""
+
+# GeoJSON file entry
+GEOJSON_Entry = \
+"""{"type": "Feature", "geometry": {"type": "Point", "coordinates": [%f, %f, %s]}, "properties": {"heading": %d, "tilt": %d, "roll": %d, "href": %s}}"""
+
+# GeoJSON file footer
+GEOJSON_Footer = \
+"""
+]}
+"""
+
+# CSV file header
+CSV_Header = \
+"""longitude,latitude,altitude,heading,tilt,roll,href
+"""
+
+# CSV file entry
+CSV_Entry = \
+"""%f,%f,%s,%d,%d,%d,%s
+"""
+
+# Map files (extension, header, entry, separator, footer)
+MAP_Files = {
+    "kml"     : ("kml", KML_Header, KML_Entry, "", KML_Footer),
+    "geojson" : ("geojson", GEOJSON_Header, GEOJSON_Entry, ",\n", GEOJSON_Footer),
+    "csv"     : ("csv", CSV_Header, CSV_Entry, "", "")
+}
+
+# Map files entries written per block
+MAP_Block = 4096
+
+# Map files write buffer size
+MAP_Buffer = 4 * 1024 * 1024
+
+# MOV file mapping window size, only the pages of the current window stay mapped
+MOV_Window = 64 * 1024 * 1024
+
 # Config variables
 DEBUG_MODE = 0
 NO_COLORS  = 0
 NO_FILTER  = 0
 QUIET_MODE = 0
 LOG_FILE   = ""
+SCAN_CHUNK = 16 * 1024 * 1024
+MAX_MEMORY = 0
+SCHEDULE   = "order"
+EXECUTOR   = "thread"
+BACKEND    = "mmap"
+PACK       = 0
+RESUME     = 0
+INDEX_DIR  = ""
+MAP_FORMATS = ["kml"]
 
 # MOV file container class
 class MovFile:
     def __init__(self, path, modulename):
         self.path = path
         self.module = int(modulename)
+        self.rank = 0
 
 # JP4 file container class
 class JP4Image:
-    def __init__(self, timestamp, module, base_folder=-1, threadid=-1):
+    def __init__(self, timestamp, module, base_folder=-1, threadid=-1, packed=False):
         self.timestamp = timestamp
         self.module = int(module)
         self.base_folder = int(base_folder)
         self.threadid = threadid
 
         # Compute default path
-        if self.base_folder != -1:
+        if packed:
+            self.path = "%s/%s_%s" % (packName(self.base_folder), timestamp, module)
+        elif self.base_folder != -1:
             if threadid != -1:
                 self.path = "%s/%s/%s_%s" % (threadid, base_folder, timestamp, module)
             else:
@@ -125,6 +256,412 @@ class JP4Image:
             else:
                 self.path = "%s_%s" % (timestamp, module)
 
+# Compact frames registry class, one typed column per frame attribute
+#  timestamps are stored as epoch and microseconds (for ordering) along with the EXIF sub-seconds value and
+#  digits count (for file names), thread and folder are -1 when not set,
+#  runs are the start indexes of the time ordered frames sequences (one per MOV file)
+class FrameRegistry:
+    def __init__(self, packed=False):
+        self.packed = packed
+        self.runs = array.array('l')
+        self.epoch = array.array('l')
+        self.usec = array.array('l')
+        self.subsec = array.array('l')
+        self.digits = array.array('B')
+        self.module = array.array('B')
+        self.thread = array.array('h')
+        self.folder = array.array('l')
+        self.offset = array.array('l')
+        self.size = array.array('l')
+
+    def __len__(self):
+        return len(self.epoch)
+
+    # Iterate over frames as JP4 images
+    def __iter__(self):
+        for i in xrange(len(self.epoch)):
+            yield self.image(i)
+
+    # Append a frame
+    def append(self, timestamp, module, thread=-1, folder=-1, offset=0, size=0):
+        epoch, usec, subsec, digits = splitTimestamp(timestamp)
+        self.epoch.append(epoch)
+        self.usec.append(usec)
+        self.subsec.append(subsec)
+        self.digits.append(digits)
+        self.module.append(int(module))
+        self.thread.append(thread)
+        self.folder.append(folder)
+        self.offset.append(offset)
+        self.size.append(size)
+
+    # Append a frame of another registry, placed in given thread and folder
+    def appendFrame(self, other, i, thread, folder):
+        self.epoch.append(other.epoch[i])
+        self.usec.append(other.usec[i])
+        self.subsec.append(other.subsec[i])
+        self.digits.append(other.digits[i])
+        self.module.append(other.module[i])
+        self.thread.append(thread)
+        self.folder.append(folder)
+        self.offset.append(other.offset[i])
+        self.size.append(other.size[i])
+
+    # Append all frames of another registry, keeping its runs
+    def extend(self, other):
+        if len(self) > 0 and len(self.runs) == 0:
+            self.runs.append(0)
+        base = len(self)
+        self.runs.extend([base + start for start in other.starts()])
+        self.epoch.extend(other.epoch)
+        self.usec.extend(other.usec)
+        self.subsec.extend(other.subsec)
+        self.digits.extend(other.digits)
+        self.module.extend(other.module)
+        self.thread.extend(other.thread)
+        self.folder.extend(other.folder)
+        self.offset.extend(other.offset)
+        self.size.extend(other.size)
+
+    # Return start indexes of runs
+    def starts(self):
+        if len(self.runs) == 0 and len(self) > 0:
+            return array.array('l', [0])
+        return self.runs
+
+    # Return a registry with given frames, in given order
+    def take(self, indexes):
+        other = FrameRegistry()
+        for name in ('epoch', 'usec', 'subsec', 'digits', 'module', 'thread', 'folder', 'offset', 'size'):
+            column = getattr(self, name)
+            if numpy is not None:
+                setattr(other, name, array.array(column.typecode, numpy.frombuffer(column, dtype=column.typecode)[indexes].tostring()))
+            else:
+                setattr(other, name, array.array(column.typecode, [column[i] for i in indexes]))
+        return other
+
+    # Return timestamp of a frame as microseconds
+    def stamp(self, i):
+        return self.epoch[i] * 1000000 + self.usec[i]
+
+    # Return timestamp of a frame, as found in EXIF data
+    def timestamp(self, i):
+        return "%d_%0*d" % (self.epoch[i], self.digits[i], self.subsec[i])
+
+    # Return a frame as JP4 image
+    def image(self, i):
+        return JP4Image(self.timestamp(i), self.module[i], self.folder[i], "t%d" % self.thread[i] if self.thread[i] != -1 else -1, self.packed)
+
+# Streaming modules sets assembler (staged mode), moves sets out of temp folder as soon as every module
+#  is extracted past their timestamp (watermark), complete sets to their final folder, others to trash,
+#  MOV files of a module must follow each other in time, sets are all kept until the end of the run otherwise
+class SetAssembler:
+    def __init__(self, MOVs, Folder, Output, Trash, Limit):
+        self.folder = Folder
+        self.output = Output
+        self.trash = Trash
+        self.window = FrameRegistry()
+        self.arranged = FrameRegistry()
+        self.floor = -1
+        self.ordered = True
+
+        # Folder indexes of arranged images, open pack files
+        self.folders = folderIndexes(Limit) if Limit > 0 else None
+        self.packs = {} if PACK else None
+        self.arranged.packed = PACK
+
+        # MOV files of each module in processing order, completed MOV files last timestamp, MOV files first timestamp
+        self.movs = {}
+        self.done = {}
+        self.first = {}
+        for MOV in MOVs:
+            self.movs.setdefault(MOV.module, []).append(MOV.path)
+
+        # Completed MOV files count and last timestamp of each module
+        self.count = dict((m, 0) for m in self.movs)
+        self.last = dict((m, -1) for m in self.movs)
+
+    # Add images of an extracted MOV file and finalize sets
+    def add(self, MOV, Registry):
+
+        # Store MOV file last timestamp
+        self.done[MOV.path] = max([Registry.stamp(i) for i in xrange(len(Registry))] or [-1])
+
+        # Advance module last timestamp over consecutive completed MOV files
+        Paths = self.movs[MOV.module]
+        while self.count[MOV.module] < len(Paths) and Paths[self.count[MOV.module]] in self.done:
+            self.last[MOV.module] = max(self.last[MOV.module], self.done[Paths[self.count[MOV.module]]])
+            self.count[MOV.module] += 1
+
+        # Append images to pending ones
+        self.window.extend(Registry)
+
+        # Finalize sets no module can add images to anymore
+        if self.ordered:
+            self.finalize(self.watermark())
+
+    # Return timestamp up to which every module is extracted, -inf once MOV files are found out of time order
+    def watermark(self):
+        Watermark = float('inf')
+        for m in range(1, CAMERA_MODULES + 1):
+            if m in self.movs and self.count[m] < len(self.movs[m]):
+
+                # Next MOV file of the module must start after the module last timestamp
+                if self.count[m] > 0 and not self.follows(m):
+                    self.ordered = False
+                    return float('-inf')
+
+                Watermark = min(Watermark, self.last[m])
+        return Watermark
+
+    # Check that the next MOV file of a module starts after the module last timestamp
+    def follows(self, m):
+        Path = self.movs[m][self.count[m]]
+
+        # Read MOV file first timestamp once
+        if Path not in self.first:
+            self.first[Path] = firstStamp(Path)
+
+        # MOV files without images cannot break the order
+        if self.first[Path] is None or self.first[Path] > self.last[m]:
+            return True
+
+        # Debug output
+        ShowMessage("%s starts before the end of the previous MOV file of module %d, sets are assembled at the end of the run" % (Path, m), 1)
+
+        return False
+
+    # Finalize all pending sets
+    def flush(self):
+        self.finalize(float('inf'))
+
+        # Close pack files
+        if self.packs:
+            for Pack in self.packs.values():
+                Pack.close()
+            self.packs.clear()
+
+    # Finalize sets up to watermark, in timestamps order, late images of already finalized timestamps
+    #  (duplicates) cannot complete their sets anymore and end up in trash
+    def finalize(self, Watermark):
+        Window = self.window
+
+        # Group images into modules sets
+        Complete, Incomplete = groupSets(Window)
+
+        # Sets to finalize
+        Arranged = [i for i in Complete if Window.stamp(i) <= Watermark]
+        Trashed = [i for i in Incomplete if Window.stamp(i) <= Watermark]
+
+        # Keep incomplete sets without filter
+        if NO_FILTER:
+            Arranged = sorted(Arranged + Trashed, key=lambda i: (Window.stamp(i), Window.module[i]))
+            Trashed = []
+
+        # Move sets images
+        trashImages(self.output, self.trash, Window, Trashed)
+        arrangeImages(self.folder, Window, Arranged, self.output, self.folders, self.arranged, self.packs)
+
+        # Keep pending images
+        self.window = Window.take([i for i in xrange(len(Window)) if Window.stamp(i) > Watermark])
+        self.floor = max(self.floor, Watermark)
+
+# Packed images file writer, images are appended and the index is written on close
+class PackWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.records = []
+
+        # Write temporary header
+        self.file.write(struct.pack(PACK_Header, PACK_Magic, 0, 0))
+        self.offset = struct.calcsize(PACK_Header)
+
+    # Append an image
+    def add(self, epoch, usec, module, data):
+        self.file.write(data)
+        self.records.append((epoch, usec, module, self.offset, len(data)))
+        self.offset += len(data)
+
+    # Write index and header
+    def close(self):
+        writePackIndex(self.file, self.records, self.offset)
+        self.file.close()
+
+# MOV file data class, maps a sliding window of the file (moved on demand) so that resident memory
+#  is bounded by the window size, slices and buffer views of any part of the file are available
+class MOVData:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = None
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.size
+
+    # Map a window holding the given range
+    def window(self, offset, size):
+        if self.map is not None and self.start <= offset and offset + size <= self.end:
+            return
+
+        # Release previous window pages
+        self.unmap()
+
+        # Window starts on an allocation boundary and spans at least the given range
+        self.start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self.end = min(self.size, max(offset + size, self.start + MOV_Window))
+        self.map = mmap.mmap(self.file.fileno(), self.end - self.start, access=mmap.ACCESS_READ, offset=self.start)
+
+    # Return a buffer view of a range, valid until the window moves
+    def view(self, offset, size):
+        if size <= 0 or offset >= self.size:
+            return buffer("")
+        size = min(size, self.size - offset)
+        self.window(offset, size)
+        return buffer(self.map, offset - self.start, size)
+
+    # Return a copy of a range
+    def __getitem__(self, key):
+        start, stop, step = key.indices(self.size)
+        return str(self.view(start, stop - start))
+
+    def unmap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self):
+        self.unmap()
+        self.file.close()
+
+# Packed images file reader, random access to images by (timestamp, module)
+class PackReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.record_size = struct.calcsize(PACK_Record)
+
+        # Read header
+        magic, self.count, self.index = struct.unpack_from(PACK_Header, self.data, 0)
+        if magic != PACK_Magic:
+            self.close()
+            raise IOError("Invalid pack file %s" % path)
+
+    def __len__(self):
+        return self.count
+
+    # Iterate over images records (epoch, microseconds, module, offset, size)
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self.record(i)
+
+    # Return an image record
+    def record(self, i):
+        return struct.unpack_from(PACK_Record, self.data, self.index + i * self.record_size)
+
+    # Return (offset, size) of an image, None if not found
+    def find(self, timestamp, module):
+        epoch, usec, subsec, digits = splitTimestamp(timestamp)
+        key = (epoch, usec, int(module))
+
+        # Binary search over sorted index
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.record(mid)[0:3] < key:
+                low = mid + 1
+            else:
+                high = mid
+
+        # Check found record
+        if low < self.count and self.record(low)[0:3] == key:
+            return self.record(low)[3:5]
+        return None
+
+    # Return image data, None if not found
+    def read(self, timestamp, module):
+        found = self.find(timestamp, module)
+        if found is None:
+            return None
+        return self.data[found[0]:found[0] + found[1]]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+# Memory budget class, admits jobs while their expected footprints fit in the budget (no limit when 0)
+class MemoryBudget:
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    # Check if a footprint can be admitted now, a footprint larger than the budget is admitted alone
+    def fits(self, size):
+        return not self.limit or self.used == 0 or self.used + size <= self.limit
+
+    # Wait until a footprint fits in the budget and reserve it
+    def acquire(self, size):
+        with self.condition:
+            while not self.fits(size):
+                self.condition.wait(1)
+            self.used += size
+
+    # Release a reserved footprint
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+# Processing manifest class, records MOV files state and produced files between runs
+class Manifest:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.text_factory = str
+
+        # Create tables if not exists
+        self.db.execute("CREATE TABLE IF NOT EXISTS movs (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, frames INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS frames (mov TEXT, timestamp TEXT, offset INTEGER, size INTEGER, output TEXT)")
+        self.db.execute("DROP INDEX IF EXISTS frames_mov")
+        self.db.execute("CREATE INDEX IF NOT EXISTS frames_mov_offset ON frames (mov, offset)")
+        self.db.commit()
+
+    # Return indexed frames of a MOV file, None if unknown or modified since
+    def getFrames(self, path):
+        Stat = os.stat(path)
+        with self.lock:
+            Row = self.db.execute("SELECT size, mtime FROM movs WHERE path = ?", (path,)).fetchone()
+            if not Row or Row[0] != Stat.st_size or Row[1] != Stat.st_mtime:
+                return None
+            return [tuple(x) for x in self.db.execute("SELECT timestamp, offset, size FROM frames WHERE mov = ? ORDER BY offset", (path,))]
+
+    # Store indexed frames of a MOV file, forgetting previously produced files
+    def setFrames(self, path, Frames):
+        Stat = os.stat(path)
+        with self.lock:
+            self.db.execute("DELETE FROM frames WHERE mov = ?", (path,))
+            self.db.execute("INSERT OR REPLACE INTO movs VALUES (?, ?, ?, ?)", (path, Stat.st_size, Stat.st_mtime, len(Frames)))
+            self.db.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, NULL)", [(path, x[0], x[1], x[2]) for x in Frames])
+            self.db.commit()
+
+    # Return files produced from a MOV file (offset -> output file)
+    def getOutputs(self, path):
+        with self.lock:
+            return dict(self.db.execute("SELECT offset, output FROM frames WHERE mov = ? AND output IS NOT NULL", (path,)).fetchall())
+
+    # Store files produced from a MOV file
+    def setOutputs(self, path, Plan):
+        with self.lock:
+            self.db.executemany("UPDATE frames SET output = ? WHERE mov = ? AND offset = ?", [(x[2], path, x[0]) for x in Plan])
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
 # Function to print debug messages
 def ShowMessage(Message, Type=0, Halt=0, ThreadID=-1):
 
@@ -206,10 +743,17 @@ def timed(f):
 def quietEnabled():
     return QUIET_MODE
 
+# Function to create a directory tree, safe when several workers create it at once
+def makeDirs(Folder):
+
+    try:
+        os.makedirs(Folder)
+    except OSError:
+        if not os.path.isdir(Folder):
+            raise
+
 # Function to find all occurences of a given input
-@timed
-def find_all(a_str, sub):
-    start = 0
+def find_all(a_str, sub, start=0):
     while True:
         # Find first element
         start = a_str.find(sub, start)
@@ -223,186 +767,1153 @@ def find_all(a_str, sub):
         # Move pointer to next occurence
         start += len(sub)
 
-# Function to count JPEG images inside a MOV file
-@timed
-def countMOV(InputFile, tid):
+# Function to map a MOV file into memory (read-only, sliding window)
+def mapMOV(InputFile):
+    return MOVData(InputFile)
+
+# Function to release a MOV file mapped by mapMOV
+def unmapMOV(mov_data):
+    mov_data.close()
+
+# Function to copy a range of a file to another one inside the kernel, returns copied bytes count
+def kernelCopy(InputFd, OutputFd, Offset, Size):
+
+    # Global variables
+    global COPY_FILE_RANGE, SENDFILE
 
     # Local variables
-    JPEGHeader    = b'\xff\xd8\xff\xe1'
+    Position = ctypes.c_int64(Offset)
+    Copied = 0
 
-    mov = open(InputFile, 'rb')
-    mov_data = mov.read()
-    mov.close()
+    # Copy until done or no kernel copy function left
+    while Copied < Size and (COPY_FILE_RANGE or SENDFILE):
+
+        # Copy next part (input position is updated by the kernel)
+        if COPY_FILE_RANGE:
+            Result = COPY_FILE_RANGE(InputFd, ctypes.byref(Position), OutputFd, None, Size - Copied, 0)
+        else:
+            Result = SENDFILE(OutputFd, InputFd, ctypes.byref(Position), Size - Copied)
+
+        # Unexpected end of file
+        if Result == 0:
+            break
+
+        # Error handling
+        if Result < 0:
+            Error = ctypes.get_errno()
+
+            # Interrupted, retry
+            if Error == errno.EINTR:
+                continue
+
+            # Not supported by kernel or filesystems, fallback to next function
+            if Error in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                if COPY_FILE_RANGE:
+                    COPY_FILE_RANGE = None
+                else:
+                    SENDFILE = None
+                continue
+
+            # Other errors
+            raise OSError(Error, os.strerror(Error))
+
+        # Increment copied bytes count
+        Copied += Result
+
+    # Return copied bytes count
+    return Copied
+
+# Function to write a JPEG image of a mapped MOV file, inside the kernel if MOV file descriptor is given
+def writeFrame(mov_data, InputFd, Output_Image, Offset, Size):
+
+    # Copy image inside the kernel
+    Copied = 0
+    if InputFd is not None:
+        Copied = kernelCopy(InputFd, Output_Image.fileno(), Offset, Size)
+
+    # Write remaining part from the mapping
+    if Copied < Size:
+        Output_Image.write(mov_data.view(Offset + Copied, Size - Copied))
+
+# Function to open a MOV file for kernel copies, None with mmap backend
+def openMOV(InputFile):
+
+    # Check backend
+    if BACKEND == "kernel":
+        return open(InputFile, 'rb')
+
+    return None
+
+# Function to iterate over QuickTime atoms contained between two offsets
+def walkAtoms(data, start, end):
+
+    # Iterate until end of parent atom
+    while start + 8 <= end:
+
+        # Read atom size and type
+        Size, Type = struct.unpack('>I4s', data[start:start + 8])
+        Header = 8
+
+        # Check for 64 bits atom size
+        if Size == 1:
+            if start + 16 > end:
+                raise ValueError("Truncated atom %s" % Type)
+            Size = struct.unpack('>Q', data[start + 8:start + 16])[0]
+            Header = 16
+
+        # Size 0 means atom extends to the end of its parent
+        elif Size == 0:
+            Size = end - start
+
+        # Check atom boundaries
+        if Size < Header or start + Size > end:
+            raise ValueError("Truncated atom %s" % Type)
+
+        # Return atom type, payload offset and end offset
+        yield Type, start + Header, start + Size
+
+        # Move to next atom
+        start += Size
+
+# Function to find first atom of a given type
+def findAtom(data, start, end, Type):
+
+    # Iterate over atoms
+    for _Type, _Start, _End in walkAtoms(data, start, end):
+        if _Type == Type:
+            return _Start, _End
+
+    # Not found
+    return None
+
+# Function to read a QuickTime table (full atom header, entry count, entries)
+def readTable(data, Atom, Type, Fields=1):
+
+    # Compute entry size
+    Start, End = Atom
+    EntrySize = struct.calcsize('>%s' % Type) * Fields
+
+    # Read entries count
+    Count = struct.unpack('>I', data[Start + 4:Start + 8])[0]
+
+    # Check table boundaries
+    if Start + 8 + Count * EntrySize > End:
+        raise ValueError("Truncated table")
+
+    # Read all entries at once
+    Values = struct.unpack_from('>%d%s' % (Count * Fields, Type), data, Start + 8)
 
-    # Search all JPEG files inside the MOV file
-    JPEG_Offsets     = list(find_all(mov_data, JPEGHeader))
-    JPEG_Offsets_len = len(JPEG_Offsets)
+    # Return table entries, grouped by entry if needed
+    if Fields == 1:
+        return list(Values)
+    else:
+        return [Values[i:i + Fields] for i in range(0, len(Values), Fields)]
+
+# Function to extract the sample tables of the video track of a moov atom
+def findSampleTables(moov):
+
+    # Iterate over tracks
+    for _Type, _Start, _End in walkAtoms(moov, 0, len(moov)):
+        if _Type != 'trak':
+            continue
+
+        # Find media atom
+        mdia = findAtom(moov, _Start, _End, 'mdia')
+        if not mdia:
+            continue
+
+        # Keep only video tracks
+        hdlr = findAtom(moov, mdia[0], mdia[1], 'hdlr')
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != 'vide':
+            continue
+
+        # Walk to sample table atom
+        minf = findAtom(moov, mdia[0], mdia[1], 'minf')
+        stbl = minf and findAtom(moov, minf[0], minf[1], 'stbl')
+        if not stbl:
+            continue
+
+        # Collect sample table atoms
+        Tables = {}
+        for __Type, __Start, __End in walkAtoms(moov, stbl[0], stbl[1]):
+            Tables[__Type] = (__Start, __End)
+
+        # Return tables of the first usable track
+        if 'stsz' in Tables and 'stsc' in Tables and ('stco' in Tables or 'co64' in Tables):
+            return Tables
+
+    # No video track found
+    return None
+
+# Function to locate the moov atom of a MOV file
+def readMoov(mov_data):
+
+    # Search moov atom in top level atoms
+    moov = findAtom(mov_data, 0, len(mov_data), 'moov')
+
+    # Return a copy of the moov atom (only a few KB)
+    return mov_data[moov[0]:moov[1]] if moov else None
+
+# Function to read the sample tables of a MOV file (sizes, chunks offsets, samples to chunks)
+def readMOVTables(mov_data):
+
+    # Read moov atom
+    moov = readMoov(mov_data)
+    if not moov:
+        return None
+
+    # Find sample tables
+    Tables = findSampleTables(moov)
+    if not Tables:
+        return None
+
+    # Read samples sizes
+    stsz = Tables['stsz']
+    SampleSize, SampleCount = struct.unpack('>II', moov[stsz[0] + 4:stsz[0] + 12])
+    if SampleSize == 0:
+        Sizes = readTable(moov, (stsz[0] + 4, stsz[1]), 'I')
+    else:
+        Sizes = [SampleSize] * SampleCount
+
+    # Read chunks offsets
+    if 'co64' in Tables:
+        Chunks = readTable(moov, Tables['co64'], 'Q')
+    else:
+        Chunks = readTable(moov, Tables['stco'], 'I')
+
+    # Read samples to chunks table
+    SampleToChunk = readTable(moov, Tables['stsc'], 'I', 3)
+
+    # Return tables
+    return Sizes, Chunks, SampleToChunk
+
+# Function to compute JPEG frames positions from MOV sample tables
+def parseMOVIndex(mov_data):
+
+    try:
+        # Read sample tables
+        MOVTables = readMOVTables(mov_data)
+        if not MOVTables:
+            return None
+
+    except (ValueError, struct.error):
+        return None
+
+    # Unpack tables
+    Sizes, Chunks, SampleToChunk = MOVTables
 
     # Variable to store results
-    Result = [0, 0, tid]
+    Frames = []
+    Sample = 0
+
+    # Iterate over samples to chunks runs
+    for _Index, (FirstChunk, PerChunk, _Desc) in enumerate(SampleToChunk):
+
+        # Compute last chunk of the run
+        if _Index + 1 < len(SampleToChunk):
+            LastChunk = SampleToChunk[_Index + 1][0] - 1
+        else:
+            LastChunk = len(Chunks)
+
+        # Iterate over chunks of the run
+        for Chunk in range(FirstChunk, LastChunk + 1):
+
+            # Check chunk index
+            if Chunk < 1 or Chunk > len(Chunks):
+                return None
+
+            # Samples are stored contiguously inside a chunk
+            _Offset = Chunks[Chunk - 1]
+            for i in range(0, PerChunk):
+
+                # Check sample index
+                if Sample >= len(Sizes):
+                    return None
+
+                # Store frame position
+                Frames.append((_Offset, Sizes[Sample]))
+
+                # Move to next sample
+                _Offset += Sizes[Sample]
+                Sample += 1
+
+    # Check tables consistency
+    if Sample != len(Sizes):
+        return None
 
-    # Store images count
-    Result[0] = JPEG_Offsets_len
+    # Check frames boundaries
+    for _Offset, Size in Frames:
+        if _Offset + Size > len(mov_data):
+            return None
 
-    # Iterate over all images
-    for _Index, _Offset in enumerate(JPEG_Offsets):
+    # Return frames positions
+    return Frames
 
-        # Calculate the filesize for extraction
-        if (_Index >= len(JPEG_Offsets) - 1):
-            Size = len(mov_data) - _Offset
+# Function to count JPEG frames and their total size from MOV sample tables only
+def countMOVIndex(mov_data):
+
+    try:
+        # Read sample tables
+        MOVTables = readMOVTables(mov_data)
+        if not MOVTables:
+            return None
+
+    except (ValueError, struct.error):
+        return None
+
+    # Unpack tables
+    Sizes, Chunks, SampleToChunk = MOVTables
+
+    # Compute samples count described by the samples to chunks table
+    Samples = 0
+    for _Index, (FirstChunk, PerChunk, _Desc) in enumerate(SampleToChunk):
+        if _Index + 1 < len(SampleToChunk):
+            LastChunk = SampleToChunk[_Index + 1][0] - 1
         else:
-            Size = (JPEG_Offsets[_Index+1] - _Offset)
+            LastChunk = len(Chunks)
+        Samples += max(LastChunk - FirstChunk + 1, 0) * PerChunk
 
-        # Increment images size
-        Result[1] += Size
+    # Compute total size
+    TotalSize = sum(Sizes)
 
-    # Return result
-    return Result
+    # Check tables consistency and boundaries
+    if Samples != len(Sizes) or TotalSize > len(mov_data) or (Chunks and max(Chunks) >= len(mov_data)):
+        return None
 
-# Thread function to count MOV files
-def countMOV_Thread(Threads, InputFile, tid):
+    # Return images count and total size
+    return len(Sizes), TotalSize
 
-    # Add action to queue
-    Threads.put(
-        countMOV(InputFile, tid)
-    )
+# Function to get the end offset of the mdat atom of a MOV file, None if unknown
+def mdatEnd(mov_data):
 
-# Function to extract JPEG images inside a MOV file
-@timed
-def extractMOV(tid, InputFile, OutputFolder, TrashFolder, ModuleName, Results_back):
+    try:
+        # Find top level mdat atom
+        Atom = findAtom(mov_data, 0, len(mov_data), 'mdat')
+
+    except (ValueError, struct.error):
+        return None
+
+    # Return atom end offset
+    return Atom[1] if Atom else None
+
+# Function to trim a scanned frame to its JPEG end of image marker, searched backward from its end,
+#  Data holds the file bytes read from offset Base
+def trimFrame(Data, Base, Offset, End):
+
+    # Bound the search to the frame, to the search window and to read data
+    Start = max(Offset, End - EOI_Window, Base)
+
+    # Find last end of image marker
+    EOI = Data.rfind(b'\xff\xd9', Start - Base, End - Base)
+
+    # Keep frame untouched when no marker is found
+    if EOI == -1:
+        return End - Offset
+
+    # Return frame size up to the end of image marker
+    return Base + EOI + 2 - Offset
+
+# Function to check that a JPEG header found by the scanner starts an EXIF APP1 segment,
+#  Header holds the file bytes read from the header offset (JPEG and APP1 markers, APP1 length, EXIF signature, TIFF byte order)
+def checkHeader(Header, Offset, FileSize):
+
+    # Check header is complete
+    if len(Header) != SCAN_Header:
+        return False
+
+    # Check APP1 segment length, it must hold the EXIF signature and a TIFF header, inside the file
+    Length = struct.unpack('>H', Header[4:6])[0]
+    if Length < 16 or Offset + 4 + Length > FileSize:
+        return False
+
+    # Check EXIF signature and TIFF header
+    return Header[6:12] == 'Exif\x00\x00' and Header[12:16] in ('II*\x00', 'MM\x00*')
+
+# Function to find JPEG frames positions by scanning a MOV file for JPEG headers, chunk by chunk,
+#  rejected headers are counted in Stats[0] if given, memory use is bounded by the chunk size
+def scanMOV(InputFile, mov_data, ChunkSize=0, Stats=None):
 
     # Local variables
     JPEGHeader    = b'\xff\xd8\xff\xe1'
-    Results       = [0, []]
-
+    ChunkSize     = ChunkSize or SCAN_CHUNK
+    FileSize      = len(mov_data)
+    Previous      = -1
+    Tail          = ""
+    Position      = 0
+    Scanned       = 0
+
+    # Open MOV file
     mov = open(InputFile, 'rb')
-    mov_data = mov.read()
+
+    # Read MOV file chunk by chunk
+    while True:
+        Chunk = mov.read(ChunkSize)
+
+        # Prepend end of previous chunk to catch headers split across two chunks and to search end of image markers
+        Data = Tail + Chunk
+        Base = Position - len(Tail)
+
+        # Headers must be complete to be checked, except at end of file
+        Limit = len(Data) - (SCAN_Header - 1) if Chunk else len(Data)
+
+        # Walk over JPEG headers found in chunk and not checked yet
+        for _Offset in find_all(Data, JPEGHeader, max(Scanned - Base, 0)):
+            if _Offset >= Limit:
+                break
+
+            # Skip header patterns found inside compressed image data
+            if not checkHeader(Data[_Offset:_Offset + SCAN_Header], Base + _Offset, FileSize):
+                if Stats is not None:
+                    Stats[0] += 1
+                continue
+
+            # Return previous frame position, now that its end is known
+            if Previous != -1:
+                yield Previous, trimFrame(Data, Base, Previous, Base + _Offset)
+
+            # Remember frame start
+            Previous = Base + _Offset
+
+        # Remember checked part
+        Scanned = max(Scanned, Base + Limit)
+
+        # Exit loop at end of file
+        if not Chunk:
+            break
+
+        # Keep end of image marker search window and a header length minus one
+        Tail = Data[-(EOI_Window + SCAN_Header - 1):]
+        Position += len(Chunk)
+
+    # Return last frame position, which extends to the end of mdat atom or to the end of file
+    if Previous != -1:
+
+        # Trailing container atoms (moov, free) must not be appended to the last frame
+        End = mdatEnd(mov_data)
+        if End is None or End <= Previous or End > Position:
+            End = Position
+
+        # Read end of last frame
+        Start = max(Previous, End - EOI_Window)
+        mov.seek(Start)
+
+        # Return last frame position
+        yield Previous, trimFrame(mov.read(End - Start), Start, Previous, End)
+
+    # Close MOV file
     mov.close()
 
-    # Initialize results counter
-    Results = Results_back
-    Results[1] = []
-    Results[2] = []
+# Function to get JPEG frames positions of a MOV file
+def getMOVFrames(InputFile, mov_data, tid=-1, Stats=None):
 
-    # Search all JPEG files inside the MOV file
-    JPEG_Offsets     = list(find_all(mov_data, JPEGHeader))
-    JPEG_Offsets_len = len(JPEG_Offsets)
+    # Read frames positions from MOV sample tables
+    Frames = parseMOVIndex(mov_data)
 
-    # Display message when no headers are found inside the MOV file
-    if JPEG_Offsets_len == 0:
-        ShowMessage("No JPEG headers found in MOV file %s" % InputFile, 1)
+    # Fallback to JPEG headers scanning
+    if Frames is None:
 
-    if Results[4] != 0:
-        if not os.path.isdir("%s/0" % OutputFolder):
-            os.makedirs("%s/0" % OutputFolder)
+        # Debug output
+        if DEBUG_MODE:
+            ShowMessage("No usable moov atom in %s, scanning for JPEG headers" % InputFile, 3, 0, tid)
+
+        # Frames positions are generated while the MOV file is being read
+        Frames = scanMOV(InputFile, mov_data, 0, Stats)
+
+    # Return frames positions
+    return Frames
+
+# Function to count JPEG images inside a MOV file
+@timed
+def countMOV(InputFile, tid):
+
+    # Map MOV file, only headers pages are read when the sample tables are usable
+    mov_data = mapMOV(InputFile)
+
+    # Variable to store results
+    Result = [0, 0, tid, 0]
+    Stats = [0]
+
+    # Count images from frames index of a previous run
+    Counts = None
+    Frames = loadIndex(InputFile)
+    if Frames is not None:
+        Counts = (len(Frames), sum([Size for Timestamp, _Offset, Size in Frames]))
+
+    # Count images from MOV sample tables
+    if Counts is None:
+        Counts = countMOVIndex(mov_data)
+
+    # Fallback to JPEG headers scanning
+    if Counts is None:
+
+        # Debug output
+        if DEBUG_MODE:
+            ShowMessage("No usable moov atom in %s, scanning for JPEG headers" % InputFile, 3, 0, tid)
+
+        # Compute images count and size while scanning the MOV file
+        Counts = [0, 0]
+        for _Offset, Size in scanMOV(InputFile, mov_data, 0, Stats):
+            Counts[0] += 1
+            Counts[1] += Size
+
+        # Store rejected JPEG headers count
+        Result[3] = Stats[0]
+
+    # Store images count and size
+    Result[0], Result[1] = Counts
 
-    # Walk over JPEG files positions
-    for _Index, _Offset in enumerate(JPEG_Offsets):
+    # Release MOV file
+    unmapMOV(mov_data)
 
-        # Calculate the filesize for extraction
-        if (_Index >= len(JPEG_Offsets) - 1):
-            Size = len(mov_data) - _Offset
+    # Return result
+    return Result
+
+# Function to read the entries of a TIFF IFD
+def readIFD(Tiff, Endian, Offset):
+
+    # Variable to store entries (tag -> field type, count, value offset)
+    Entries = {}
+
+    # Read entries count
+    Count = struct.unpack_from(Endian + 'H', Tiff, Offset)[0]
+
+    # Iterate over entries
+    for i in range(0, Count):
+
+        # Read entry
+        Entry = Offset + 2 + i * 12
+        Tag, Type, Values = struct.unpack_from(Endian + 'HHI', Tiff, Entry)
+
+        # Skip unsupported field types
+        if not Type in EXIF_Types:
+            continue
+
+        # Values larger than 4 bytes are stored at an offset
+        if Values * EXIF_Types[Type] > 4:
+            Position = struct.unpack_from(Endian + 'I', Tiff, Entry + 8)[0]
         else:
-            Size = (JPEG_Offsets[_Index+1] - _Offset)
+            Position = Entry + 8
+
+        # Check value boundaries
+        if Position + Values * EXIF_Types[Type] > len(Tiff):
+            raise ValueError("Truncated IFD entry")
+
+        # Store entry
+        Entries[Tag] = (Type, Values, Position)
+
+    # Return entries
+    return Entries
+
+# Function to decode a TIFF IFD entry value
+def readIFDValue(Tiff, Endian, Entry):
+
+    # Unpack entry
+    Type, Values, Position = Entry
+
+    # ASCII string, drop anything after the first null like exifread does
+    if Type == 2:
+        return Tiff[Position:Position + Values].split('\x00', 1)[0]
+
+    # Rationals, returned as (numerator, denominator) pairs
+    if Type == 5:
+        Data = struct.unpack_from('%s%dI' % (Endian, Values * 2), Tiff, Position)
+        return [(Data[i], Data[i + 1]) for i in range(0, len(Data), 2)]
+
+    # Integers
+    return list(struct.unpack_from('%s%d%s' % (Endian, Values, {1: 'B', 3: 'H', 4: 'I'}[Type]), Tiff, Position))
+
+# Function to read only the needed EXIF tags from a JPEG APP1 segment, None if it cannot be read
+def readEXIF(ImageData, GPS=False):
+
+    # Variable to store results
+    Tags = {}
+
+    try:
+        # Check JPEG and APP1 markers
+        if ImageData[0:4] != b'\xff\xd8\xff\xe1':
+            return None
+
+        # Copy APP1 segment only
+        Length = struct.unpack('>H', ImageData[4:6])[0]
+        Segment = ImageData[4:4 + Length]
+
+        # Check segment size and EXIF signature
+        if len(Segment) != Length or Segment[2:8] != 'Exif\x00\x00':
+            return None
+
+        # Get TIFF header and byte order
+        Tiff = Segment[8:]
+        if Tiff[0:2] == 'II':
+            Endian = '<'
+        elif Tiff[0:2] == 'MM':
+            Endian = '>'
+        else:
+            return None
+
+        # Check TIFF magic number
+        Magic, Offset = struct.unpack_from(Endian + 'HI', Tiff, 2)
+        if Magic != 42:
+            return None
+
+        # Read IFD0
+        IFD0 = readIFD(Tiff, Endian, Offset)
+        for Tag in EXIF_Tags_IFD0:
+            if Tag in IFD0:
+                Tags[EXIF_Tags_IFD0[Tag]] = readIFDValue(Tiff, Endian, IFD0[Tag])
+
+        # Read EXIF IFD
+        if 0x8769 in IFD0:
+            IFD = readIFD(Tiff, Endian, readIFDValue(Tiff, Endian, IFD0[0x8769])[0])
+            for Tag in EXIF_Tags_EXIF:
+                if Tag in IFD:
+                    Tags[EXIF_Tags_EXIF[Tag]] = readIFDValue(Tiff, Endian, IFD[Tag])
+
+        # Read GPS IFD if requested
+        if GPS and 0x8825 in IFD0:
+            IFD = readIFD(Tiff, Endian, readIFDValue(Tiff, Endian, IFD0[0x8825])[0])
+            for Tag in EXIF_Tags_GPS:
+                if Tag in IFD:
+                    Tags[EXIF_Tags_GPS[Tag]] = readIFDValue(Tiff, Endian, IFD[Tag])
+
+    except (ValueError, IndexError, KeyError, struct.error):
+        return None
+
+    # Timestamp tags are required
+    if not ('Image DateTime' in Tags and 'EXIF SubSecTimeOriginal' in Tags):
+        return None
+
+    # Return tags
+    return Tags
+
+# Function to convert an EXIF DateTime (YYYY:MM:DD HH:MM:SS) into an UTC epoch
+def dateTime2epoch(DateTime):
+
+    # Consecutive frames share the same DateTime, check cache first
+    Epoch = EPOCH_Cache.get(DateTime)
+
+    if Epoch is None:
+
+        # Split date and time fields
+        Date, Time = DateTime.split(' ')
+        Fields = [int(x) for x in Date.split(':') + Time.split(':')]
+
+        # Check fields count and ranges (raises ValueError like strptime)
+        if len(Fields) != 6:
+            raise ValueError("Invalid DateTime %s" % DateTime)
+        datetime(*Fields)
+
+        # Compute epoch
+        Epoch = calendar.timegm(Fields)
+
+        # Keep cache bounded
+        if len(EPOCH_Cache) >= 4096:
+            EPOCH_Cache.clear()
+
+        # Store result
+        EPOCH_Cache[DateTime] = Epoch
+
+    # Return result
+    return Epoch
+
+# Function to read the EXIF tags of a JPEG image, targeted reader first then full exifread parsing
+def frameEXIF(ImageData, GPS=False):
 
-        # Extract JPEG from MOV file
-        ImageData = mov_data[_Offset:(Size + _Offset if Size is not None else None)]
+    # Read timestamp (and GPS) EXIF tags from JPEG APP1 segment
+    EXIF_Tags = readEXIF(ImageData, GPS)
+
+    # Fallback to full EXIF parsing for malformed frames
+    if EXIF_Tags is None:
 
         # Extract EXIF data from JPEG file
         ImageData_File = StringIO(ImageData)
         EXIF_Tags = exifread.process_file(ImageData_File)
         ImageData_File.close()
 
-        # Output file variables
-        Output_Name = ""
-        Output_Image = None
+    # Return tags
+    return EXIF_Tags
+
+# Function to compute the timestamp (epoch_subsec) of a JPEG image from its EXIF tags, None on failure
+def frameTimestamp(EXIF_Tags):
+
+    # Error handling
+    if len(EXIF_Tags) <= 0:
+        return None
+
+    # Check sub-seconds, only numeric values can be ordered and indexed
+    SubSec = str(EXIF_Tags["EXIF SubSecTimeOriginal"])
+    if not SubSec.isdigit() or len(SubSec) > 9:
+        return None
+
+    # Compute timestamp
+    epoch = dateTime2epoch(str(EXIF_Tags["Image DateTime"]))
+    return "%d_%s" % (epoch, SubSec)
+
+# Function to split a timestamp into epoch, microseconds, sub-seconds value and sub-seconds digits count
+def splitTimestamp(Timestamp):
+
+    # Split epoch and sub-seconds
+    Epoch, SubSec = Timestamp.split('_', 1)
+    Digits = len(SubSec)
+
+    # Scale sub-seconds to microseconds
+    if Digits <= 6:
+        Usec = int(SubSec) * 10 ** (6 - Digits)
+    else:
+        Usec = int(SubSec) // 10 ** (Digits - 6)
+
+    # Return timestamp parts
+    return int(Epoch), Usec, int(SubSec), Digits
+
+# Function to compute the frames index path of a MOV file
+def indexPath(InputFile):
+
+    # Store index in cache folder if specified (named after a hash of the absolute MOV path), next to MOV file otherwise
+    if INDEX_DIR:
+        Path = os.path.abspath(InputFile)
+        return "%s/%s_%s.idx" % (INDEX_DIR, os.path.basename(Path), hashlib.sha1(Path).hexdigest())
+    else:
+        return "%s.idx" % InputFile
+
+# Function to load the frames index of a MOV file, None if missing or outdated
+def loadIndex(InputFile):
+
+    # Get MOV file state
+    Stat = os.stat(InputFile)
+
+    try:
+        # Read index file
+        with open(indexPath(InputFile), 'rb') as IndexFile:
+            Data = IndexFile.read()
+
+        # Check index header against MOV file
+        Magic, Size, MTime, Count = struct.unpack_from(INDEX_Header, Data, 0)
+        if Magic != INDEX_Magic or Size != Stat.st_size or MTime != Stat.st_mtime:
+            return None
+
+        # Check index size
+        HeaderSize = struct.calcsize(INDEX_Header)
+        RecordSize = struct.calcsize(INDEX_Record)
+        if len(Data) != HeaderSize + Count * RecordSize:
+            return None
+
+    except (IOError, struct.error):
+        return None
+
+    # Variable to store results (timestamp, offset, size)
+    Frames = []
+
+    # Iterate over records
+    for i in range(0, Count):
+        _Offset, Size, Epoch, SubSec, Digits, _Module = struct.unpack_from(INDEX_Record, Data, HeaderSize + i * RecordSize)
+
+        # No digits means the image has no EXIF timestamp
+        if Digits == 0:
+            Frames.append((None, _Offset, Size))
+        else:
+            Frames.append(("%d_%0*d" % (Epoch, Digits, SubSec), _Offset, Size))
+
+    # Return frames
+    return Frames
+
+# Function to save the frames index of a MOV file
+def saveIndex(InputFile, ModuleName, Frames):
+
+    # Get MOV file state
+    Stat = os.stat(InputFile)
+
+    # Build index header
+    Records = [struct.pack(INDEX_Header, INDEX_Magic, Stat.st_size, Stat.st_mtime, len(Frames))]
+
+    # Build index records
+    for Timestamp, _Offset, Size in Frames:
+
+        # Images without EXIF timestamp
+        if Timestamp is None:
+            Records.append(struct.pack(INDEX_Record, _Offset, Size, 0, 0, 0, int(ModuleName)))
+            continue
+
+        # Split timestamp, only numeric sub-seconds can be stored
+        Epoch, SubSec = Timestamp.split('_', 1)
+        if not SubSec.isdigit() or len(SubSec) > 9:
+            return
+
+        Records.append(struct.pack(INDEX_Record, _Offset, Size, int(Epoch), int(SubSec), len(SubSec), int(ModuleName)))
+
+    # Write index next to MOV file (or in cache folder), MOV folders may be read-only
+    Path = indexPath(InputFile)
+    try:
+        with open("%s.tmp" % Path, 'wb') as IndexFile:
+            IndexFile.write(''.join(Records))
+        os.rename("%s.tmp" % Path, Path)
+    except (IOError, OSError), err:
+        if DEBUG_MODE:
+            ShowMessage("Unable to write frames index %s (%s)" % (Path, err), 3)
+
+# Function to read the timestamp (unless already indexed) and the GPS position (if requested) of a MOV frame
+def parseFrame(mov_data, Frame, Indexed, GPS):
+
+    # Unpack frame
+    Timestamp, _Offset, Size = Frame
+
+    # Indexed frames only need EXIF data for their GPS position
+    if Indexed and (not GPS or Timestamp is None):
+        return Timestamp, _Offset, Size, None
+
+    # Read image EXIF data
+    EXIF_Tags = frameEXIF(mov_data.view(_Offset, Size), GPS)
+
+    # Compute image timestamp
+    if not Indexed:
+        Timestamp = frameTimestamp(EXIF_Tags)
+
+    # Compute GPS position
+    Row = None
+    if GPS and Timestamp is not None:
+        Row = gpsRow(EXIF_Tags)
+
+    # Return parsed frame
+    return Timestamp, _Offset, Size, Row
+
+# Function to iterate over JPEG images of a MOV file with their timestamp, from frames index if available
+def iterMOVFrames(InputFile, ModuleName, mov_data, tid=-1, Positions=None, Stats=None):
+
+    # Load frames index of a previous run
+    Frames = loadIndex(InputFile)
+    Indexed = Frames is not None
+
+    # Frames positions are generated while the MOV file is being read
+    if not Indexed:
+        Frames = ((None, _Offset, Size) for _Offset, Size in getMOVFrames(InputFile, mov_data, tid, Stats))
+
+    # Variable to store new frames index
+    Index = []
+
+    # Walk over frames, computing images timestamps and GPS positions
+    for Frame in Frames:
+        Timestamp, _Offset, Size, Row = parseFrame(mov_data, Frame, Indexed, Positions is not None)
+
+        # Store GPS position if requested, images without GPS data are marked as such
+        if Positions is not None and Timestamp is not None:
+            Positions[Timestamp] = GPS_Missing if Row is None else Row
+
+        # Store image
+        if not Indexed:
+            Index.append((Timestamp, _Offset, Size))
+
+        # Return image
+        yield Timestamp, _Offset, Size
+
+    # Save frames index for next runs
+    if not Indexed:
+        saveIndex(InputFile, ModuleName, Index)
+
+# Function to read the timestamp of the first image of a MOV file as microseconds, None without readable images
+def firstStamp(InputFile):
+
+    # Map MOV file
+    try:
+        mov_data = mapMOV(InputFile)
+    except EnvironmentError:
+        return None
+
+    try:
+        # Return timestamp of first image having one
+        for Timestamp, _Offset, Size in iterMOVFrames(InputFile, None, mov_data):
+            if Timestamp is not None:
+                Epoch, Usec, SubSec, Digits = splitTimestamp(Timestamp)
+                return Epoch * 1000000 + Usec
+    except EnvironmentError:
+        pass
+    finally:
+        unmapMOV(mov_data)
+
+    # No image found
+    return None
+
+# Function to extract JPEG images inside a MOV file, Counters are the thread slot counters (fail counter,
+#  extracted files count, file limit value, file limit counter, file limit dir index, thread id) updated in place,
+#  returns extracted files registry, GPS positions, slot counters, failed images count and rejected headers count
+@timed
+def extractMOV(tid, InputFile, OutputFolder, TrashFolder, ModuleName, Counters):
+
+    # Map MOV file
+    mov_data = mapMOV(InputFile)
+    mov = openMOV(InputFile)
+    mov_fd = mov.fileno() if mov else None
+
+    # Extracted files registry
+    Registry = FrameRegistry()
+
+    # Keep GPS positions of first module images for KML generation
+    Positions = {} if int(ModuleName) == 1 else None
+
+    # Local variables
+    JPEG_Count  = 0
+    Fail_Count  = 0
+    Stats       = [0]
+
+    if Counters[2] != 0:
+        if not os.path.isdir("%s/0" % OutputFolder):
+            os.makedirs("%s/0" % OutputFolder)
+
+    try:
+        # Walk over JPEG files positions and timestamps
+        for Timestamp, _Offset, Size in iterMOVFrames(InputFile, ModuleName, mov_data, tid, Positions, Stats):
+
+            # Increment found images count
+            JPEG_Count += 1
+
+            # Output file variables
+            Output_Name = ""
+            Output_Path = None
+
+            # Error handling
+            if Timestamp is None:
+
+                # Print error
+                ShowMessage("Failed to read EXIF data", 1, 0, tid)
+
+                # Calculate filename
+                Output_Name = "fail_%d_exif" % (Counters[0])
+
+                # Compute output file path
+                Output_Path = '%s/%s.jp4' % (TrashFolder, Output_Name)
+
+                # Print error
+                ShowMessage("Saving image to %s/%s.jp4" % (TrashFolder, Output_Name), 1, 0, tid)
+
+                # Increment fail counters
+                Counters[0] += 1
+                Fail_Count += 1
+            else:
+
+                # Calculate the output filename
+                Output_Name = "%s_%s" % (Timestamp, ModuleName)
+
+                # Increment extracted files count
+                Counters[1] += 1
+
+                # Save output folder
+                OutDir = OutputFolder
+
+                # Check if max files option is specified
+                if Counters[2] != 0:
+
+                    # Initialize base folder (0)
+                    OutDir = "%s/%s" % (OutputFolder, Counters[4])
+
+                    # Check if extracted files exceed limit
+                    if Counters[1] > Counters[3]:
+
+                        # Increment folder index
+                        Counters[4] += 1
+
+                        # Increment actual limit by max files
+                        Counters[3] += Counters[2]
+
+                        # Determine output folder
+                        OutDir = "%s/%s" % (OutputFolder, Counters[4])
+
+                        # Notify user about directory change
+                        ShowMessage("Directory changed to %s due to files limit" % (OutDir), 0, 0, tid)
+
+                        # Create directory if not exists
+                        if not os.path.isdir(OutDir):
+                            os.makedirs(OutDir)
+
+                # Add frame to registry
+                if Counters[2] != 0:
+                    Registry.append(Timestamp, ModuleName, Counters[5], Counters[4], _Offset, Size)
+                else:
+                    Registry.append(Timestamp, ModuleName, Counters[5], -1, _Offset, Size)
+
+                # Compute output file path
+                Output_Path = '%s/%s.jp4' % (OutDir, Output_Name)
+
+            # Write the file
+            with open(Output_Path, 'wb') as Output_Image:
+                writeFrame(mov_data, mov_fd, Output_Image, _Offset, Size)
+
+    finally:
+        # Release MOV file
+        unmapMOV(mov_data)
+        if mov:
+            mov.close()
+
+    # Display message when no headers are found inside the MOV file
+    if JPEG_Count == 0:
+        ShowMessage("No JPEG headers found in MOV file %s" % InputFile, 1)
+
+    # Return MOV file results
+    return Registry, Positions, Counters, Fail_Count, Stats[0]
+
+# Function to index JPEG images of a MOV file without extracting them (direct mode)
+@timed
+def indexMOV(InputFile, ModuleName, tid=-1):
+
+    # Map MOV file
+    mov_data = mapMOV(InputFile)
+
+    # Variable to store results (timestamp, offset, size), timestamp is None on EXIF failure
+    Frames = []
+
+    # Keep GPS positions of first module images for KML generation
+    Positions = {} if int(ModuleName) == 1 else None
+
+    # Variable to store rejected JPEG headers count
+    Stats = [0]
+
+    # Walk over JPEG files positions and timestamps
+    for Timestamp, _Offset, Size in iterMOVFrames(InputFile, ModuleName, mov_data, tid, Positions, Stats):
+
+        # Print error
+        if Timestamp is None:
+            ShowMessage("Failed to read EXIF data", 1, 0, tid)
+
+        # Store image
+        Frames.append((Timestamp, _Offset, Size))
+
+    # Display message when no headers are found inside the MOV file
+    if len(Frames) == 0:
+        ShowMessage("No JPEG headers found in MOV file %s" % InputFile, 1)
+
+    # Release MOV file
+    unmapMOV(mov_data)
+
+    # Return images, GPS positions and rejected JPEG headers count
+    return Frames, Positions, Stats[0]
+
+# Function to write JPEG images of a MOV file to their planned location (direct mode)
+@timed
+def writeMOV(InputFile, Plan):
+
+    # Map MOV file
+    mov_data = mapMOV(InputFile)
+    mov = openMOV(InputFile)
+    mov_fd = mov.fileno() if mov else None
+
+    # Variables to store known folders and open pack files
+    Folders = set()
+    Packs = {}
+
+    try:
+        # Walk over planned images
+        for _Offset, Size, OutputFile in Plan:
+
+            # Write image in pack file at its planned offset
+            if '#' in OutputFile:
+                PackPath, PackOffset = OutputFile.rsplit('#', 1)
+                if not PackPath in Packs:
+                    Packs[PackPath] = open(PackPath, 'r+b')
+
+                # Position file descriptor (kernel copies bypass file object position)
+                Packs[PackPath].flush()
+                os.lseek(Packs[PackPath].fileno(), int(PackOffset), os.SEEK_SET)
+                writeFrame(mov_data, mov_fd, Packs[PackPath], _Offset, Size)
+                continue
+
+            # Create output directory if not exists
+            Folder = os.path.dirname(OutputFile)
+            if not Folder in Folders:
+                makeDirs(Folder)
+                Folders.add(Folder)
+
+            # Write the file
+            with open(OutputFile, 'wb') as Output_Image:
+                writeFrame(mov_data, mov_fd, Output_Image, _Offset, Size)
+
+    finally:
+        # Close pack files
+        for PackFile in Packs.values():
+            PackFile.close()
+
+        # Release MOV file
+        unmapMOV(mov_data)
+        if mov:
+            mov.close()
+
+    # Return written images count
+    return len(Plan)
 
-        # Error handling
-        if len(EXIF_Tags) <= 0:
+# Function to reuse images produced by a previous run, returns the images still to be written
+def reuseImages(Plan, Outputs):
 
-            # Print error
-            ShowMessage("Failed to read EXIF data", 1, 0, tid)
+    # Variable to store images to write
+    Remaining = []
 
-            # Calculate filename
-            Output_Name = "fail_%d_exif" % (Results[0])
+    # Walk over planned images
+    for _Offset, Size, OutputFile in Plan:
 
-            # Open output file
-            Output_Image = open('%s/%s.jp4' % (TrashFolder, Output_Name), 'wb')
+        # Get file produced by previous run
+        Previous = Outputs.get(_Offset)
 
-            # Print error
-            ShowMessage("Saving image to %s/%s.jp4" % (TrashFolder, Output_Name), 1, 0, tid)
+        # Image already at its location
+        if Previous == OutputFile and os.path.isfile(OutputFile):
+            continue
 
-            # Increment fail counter
-            Results[0] += 1
-        else:
+        # Image moved to another folder (files limit or trash), names are unique except for EXIF failures
+        if Previous and os.path.basename(Previous) == os.path.basename(OutputFile) and os.path.isfile(Previous):
+            makeDirs(os.path.dirname(OutputFile))
+            os.rename(Previous, OutputFile)
+            continue
 
-            # Calculate the output filename
-            date_object = datetime.strptime(str(EXIF_Tags["Image DateTime"]), '%Y:%m:%d %H:%M:%S')
-            epoch = calendar.timegm(date_object.utctimetuple())
-            Output_Name = "%d_%s_%s" % (epoch, EXIF_Tags["EXIF SubSecTimeOriginal"], ModuleName)
+        # Image has to be written
+        Remaining.append((_Offset, Size, OutputFile))
 
-            # Increment extracted files count
-            Results[3] += 1
+    # Return images to write
+    return Remaining
 
-            # Save output folder
-            OutDir = OutputFolder
+# Job function to extract a MOV file
+def extractMOV_Job(tid, MOV, Pool, Output, Trash, Counters):
 
-            # Check if max files option is specified
-            if Results[4] != 0:
+    # Assign thread id
+    Counters[5] = tid
 
-                # Initialize base folder (0)
-                OutDir = "%s/%s" % (OutputFolder, Results[6])
+    # Compute output folder
+    OutputFolder = "%s/t%d" % (Output, tid)
 
-                # Check if extracted files exceed limit
-                if Results[3] > Results[5]:
+    # Create dir if not exists
+    if not os.path.isdir(OutputFolder):
+        os.makedirs(OutputFolder)
 
-                    # Increment folder index
-                    Results[6] += 1
+    # Check executor type
+    if Pool:
 
-                    # Increment actual limit by max files
-                    Results[5] += Results[4]
+        # Extract MOV file in a worker process, only slot counters are sent, keep them for next MOV
+        Results = Pool.apply(
+            extractMOV,
+            (tid, MOV.path, OutputFolder, Trash, MOV.module, Counters)
+        )
+        Counters[:] = Results[2]
 
-                    # Determine output folder
-                    OutDir = "%s/%s" % (OutputFolder, Results[6])
+    else:
 
-                    # Notify user about directory change
-                    ShowMessage("Directory changed to %s due to files limit" % (OutDir), 0, 0, tid)
+        # Extract MOV file in this thread
+        Results = extractMOV(tid, MOV.path, OutputFolder, Trash, MOV.module, Counters)
 
-                    # Create directory if not exists
-                    if not os.path.isdir(OutDir):
-                        os.makedirs(OutDir)
+    # Return results
+    return Results
 
-            # Add timestamp to list
-            if Results[4] != 0:
-                Results[1].append("t%d/%d/%s" % (Results[7], Results[6], Output_Name))
-                Results[2].append("t%d/%d/%s" % (Results[7], Results[6], Output_Name))
-            else:
-                Results[1].append("t%d/%s" % (Results[7], Output_Name))
-                Results[2].append("t%d/%s" % (Results[7], Output_Name))
+# Job function to count a MOV file
+def countMOV_Job(tid, MOV, Pool):
 
-            # Open output file
-            Output_Image = open('%s/%s.jp4' % (OutDir, Output_Name), 'wb')
+    # Count MOV file
+    return callJob(Pool, countMOV, (MOV.path, tid))
 
-        # write the file
-        Output_Image.write(ImageData)
-        Output_Image.close()
+# Function to call a job function in a worker process if a pool is given, in current thread otherwise
+def callJob(Pool, Function, Args):
 
-    return Results
+    # Check executor type
+    if Pool:
+        return Pool.apply(Function, Args)
+    else:
+        return Function(*Args)
 
-# Thread function to extract MOV files
-def extractMOV_Thread(tid, Threads, InputFile, OutputFolder, TrashFolder, ModuleName, Results_back):
-
-    # Add action to queue
-    Threads.put(
-        extractMOV(
-            tid,
-            InputFile,
-            OutputFolder,
-            TrashFolder,
-            ModuleName,
-            Results_back
-        )
-    )
+# Function to create the worker processes pool
+def createProcessPool(Jobs):
+
+    # Workers ignore CTRL-C, interruption is handled by main process
+    return multiprocessing.Pool(Jobs, signal.signal, (signal.SIGINT, signal.SIG_IGN))
 
 # Function to retrieve each timestamps into an array of strings
 @timed
@@ -428,168 +1939,392 @@ def getTimeStamps(Output):
     # Return timestamp list
     return sorted(TimeStamps)
 
-# Function to move all incomplete sequences to __Trash__ folder, a complete sequence need to be 1-9
-@timed
-def filterImages(Output, Trash, Results):
+# Function to check if a keys stream is sorted
+def isOrdered(Keys):
 
-    # Variable to store images informations
-    TSList = {}
-    ValidatedImages = []
+    # Previous key
+    Previous = None
 
-    # Iterate over extracted images
-    for elem in Results[2]:
+    # Compare each key with previous one
+    for Key in Keys:
+        if Previous is not None and Key < Previous:
+            return False
+        Previous = Key
 
-        # Retrieve base folder if available and timestamp
-        seg = elem.split('/')
+    # Stream is sorted
+    return True
 
-        # Check presense of base folder
-        if len(seg) > 2:
+# Function to compute the merge keys (epoch, microseconds, module, index) of a registry run
+def runKeys(Registry, Start, End):
 
-            # Extract parts (timestamp, microsec, module)
-            parts = seg[2].split('_')
+    # Iterate over run frames
+    for i in xrange(Start, End):
+        yield (Registry.epoch[i], Registry.usec[i], Registry.module[i], i)
 
-            # Build timestamp without module
-            ts = "%s_%s" % (parts[0], parts[1])
+# Function to merge time ordered runs of a registry (heap based k-way merge), yields frames indexes
+#  sorted by timestamp and module, duplicated frames in original order
+def mergeFrames(Registry):
 
-            # Insert timestamp into list if not exists
-            if not ts in TSList:
-                TSList[ ts ] = {}
+    # Variable to store runs iterators
+    Runs = []
 
-            # Insert module and base folder to list if module not exists
-            if not parts[2] in TSList[ts]:
-                TSList[ ts ][ int(parts[2]) ] = [seg[0], int(seg[1])]
+    # Compute runs boundaries
+    Starts = list(Registry.starts()) + [len(Registry)]
 
+    # Walk over runs
+    for Start, End in zip(Starts[:-1], Starts[1:]):
+
+        # Frames keys stream of run, sorted if needed
+        if isOrdered(runKeys(Registry, Start, End)):
+            Runs.append(runKeys(Registry, Start, End))
         else:
+            Runs.append(iter(sorted(runKeys(Registry, Start, End))))
 
-            # Extract parts (timestamp, microsec, module)
-            parts = seg[1].split('_')
+    # Merge runs
+    for Key in heapq.merge(*Runs):
+        yield Key[3]
 
-            # Build timestamp without module
-            ts = "%s_%s" % (parts[0], parts[1])
+# Function to sort registry frames by timestamp and module, keeping first frame of duplicated (timestamp, module),
+#  and split them into complete and incomplete modules sets, returns both frames indexes lists
+def groupSets(Registry):
 
-            # Insert timestamp into list if not exists
-            if not ts in TSList:
-                TSList[ts] = {}
+    # Nothing to group
+    if len(Registry) == 0:
+        return [], []
 
-            # Insert module into list if module not exists
-            if not parts[2] in TSList[ts]:
-                TSList[ts][int(parts[2])] = [seg[0], -1]
+    # Pure python grouping without NumPy
+    if numpy is None:
 
-    # Walk over paths
-    for ts in TSList:
+        # Merge frames of modules range 1-9 (first duplicate stays first)
+        Order = (i for i in mergeFrames(Registry) if 1 <= Registry.module[i] <= CAMERA_MODULES)
 
-        # Missing modules array
-        Missing_Modules = []
+        # Variables to store sets
+        Complete = []
+        Incomplete = []
 
-        # Walk over modules range 1-9
-        for i in range(1, CAMERA_MODULES + 1):
+        # Walk over timestamps
+        for ts, Frames in itertools.groupby(Order, key=lambda i: (Registry.epoch[i], Registry.usec[i])):
 
-            # Check if module exists
-            if not(i in TSList[ts]):
+            # Drop duplicated modules
+            Set = [next(Group) for m, Group in itertools.groupby(Frames, key=lambda i: Registry.module[i])]
 
-                # Append missing module to list
-                Missing_Modules.append(i)
+            # Check set completeness
+            if len(Set) == CAMERA_MODULES:
+                Complete.extend(Set)
+            else:
+                Incomplete.extend(Set)
 
-        # Check presense of missing modules
-        if len(Missing_Modules) > 0:
+        # Return sets
+        return Complete, Incomplete
 
-            # Calculate modules to be removed
-            ToRemove = [x for x in range(1, CAMERA_MODULES + 1) if x not in Missing_Modules]
+    # Registry columns as arrays (no copy)
+    Epoch  = numpy.frombuffer(Registry.epoch, dtype=Registry.epoch.typecode)
+    Usec   = numpy.frombuffer(Registry.usec, dtype=Registry.usec.typecode)
+    Module = numpy.frombuffer(Registry.module, dtype=Registry.module.typecode)
 
-            # Debug output
-            if not quietEnabled():
-                ShowMessage("Incomplete timestamp %s (Missing module(s) %s)" % (ts, str(Missing_Modules)[1:-1]), 1)
+    # Frames of modules range 1-9
+    Order = numpy.flatnonzero((Module >= 1) & (Module <= CAMERA_MODULES))
+
+    # Pack (timestamp, module) into a single sort key
+    if len(Order) == len(Registry):
+        Key = (Epoch * 1000000 + Usec) * 256 + Module
+    else:
+        Key = (Epoch[Order] * 1000000 + Usec[Order]) * 256 + Module[Order]
 
-            # Iterate over missing modules
-            for m in ToRemove:
+    # Sort frames
+    Sort = numpy.argsort(Key)
+    Key = Key[Sort]
+    if len(Order) == len(Registry):
+        Order = Sort
+    else:
+        Order = Order[Sort]
 
-                # Get subfolder (if not set is -1)
-                SubFolder = TSList[ts][m][1]
+    # Drop duplicated modules, first frame stays
+    Keep = numpy.ones(len(Order), dtype=bool)
+    Keep[1:] = Key[1:] != Key[:-1]
+    if not Keep.all():
+        Keep = numpy.flatnonzero(Keep)
+        Order, Key = numpy.minimum.reduceat(Order, Keep), Key[Keep]
 
-                # Check presense of subfolder and calculate source file name
-                if SubFolder != -1:
-                    SourceFile = "%s/%s/%s/%s_%s.jp4" % (Output, TSList[ts][m][0], TSList[ts][m][1], ts, m)
-                else:
-                    SourceFile = "%s/%s/%s_%s.jp4" % (Output, TSList[ts][m][0], ts, m)
+    # Unpack timestamps
+    Stamp = Key >> 8
 
-                # Calculate destination file name
-                DestFile   = "%s/%s_%s.jp4" % (Trash, ts, m)
+    # Compute timestamps boundaries and sets sizes
+    Starts = numpy.ones(len(Order), dtype=bool)
+    Starts[1:] = Stamp[1:] != Stamp[:-1]
+    Starts = numpy.flatnonzero(Starts)
+    Sizes = numpy.diff(numpy.append(Starts, len(Order)))
 
-                # Check if dest trash file exists, if exists remove it
-                if os.path.isfile(DestFile):
-                    os.remove(DestFile)
+    # Check sets completeness
+    Full = numpy.repeat(Sizes == CAMERA_MODULES, Sizes)
 
-                # Move file
-                if os.path.isfile(SourceFile):
-                    shutil.move(SourceFile, DestFile)
-        else:
-            # Iterate over possible modules
-            for i in range(1, CAMERA_MODULES + 1):
+    # Return sets
+    return Order[Full], Order[~Full]
 
-                # Get base folder
-                folder = TSList[ts][i][1]
+# Function to move incomplete modules sets images to __Trash__ folder, indexes are sorted by timestamp
+def trashImages(Output, Trash, Registry, Indexes):
 
-                # Check presence of base folder
-                if folder != -1:
-                    ValidatedImages.append( JP4Image(ts, i, TSList[ts][i][1], TSList[ts][i][0]) )
-                else:
-                    ValidatedImages.append( JP4Image(ts, i, -1, TSList[ts][i][0]) )
-    # Sort images
-    ValidatedImages = sorted(ValidatedImages, key=lambda item: item.timestamp)
+    # Walk over incomplete timestamps
+    for ts, Frames in itertools.groupby(Indexes, key=lambda i: (Registry.epoch[i], Registry.usec[i])):
 
-    # Return sorted result
-    return ValidatedImages
+        # Present images
+        Frames = list(Frames)
+
+        # Debug output
+        if not quietEnabled():
+            Present = [Registry.module[i] for i in Frames]
+            Missing_Modules = [x for x in range(1, CAMERA_MODULES + 1) if x not in Present]
+            ShowMessage("Incomplete timestamp %s (Missing module(s) %s)" % (Registry.timestamp(Frames[0]), str(Missing_Modules)[1:-1]), 1)
+
+        # Iterate over present modules
+        for i in Frames:
+
+            # Calculate source and destination file names
+            SourceFile = "%s/%s.jp4" % (Output, Registry.image(i).path)
+            DestFile   = "%s/%s_%s.jp4" % (Trash, Registry.timestamp(i), Registry.module[i])
+
+            # Check if dest trash file exists, if exists remove it
+            if os.path.isfile(DestFile):
+                os.remove(DestFile)
+
+            # Move file
+            if os.path.isfile(SourceFile):
+                shutil.move(SourceFile, DestFile)
 
-# Function to rearange images into full modules sets
-def rearrangeImages(Folder, Images, Output, Limit):
+# Function to compute the folder index of each image of a sorted images list, folders change on full modules sets only
+def folderIndexes(Limit):
 
     # Scope variables
     Counter = 0
     Folder_Index = 0
     Limit_Counter = Limit
-    Arranged_List = []
 
     # Iterate over images
-    if Limit > 0:
-        for image in Images:
+    while True:
 
-            # Compute output directory
+        # Return folder index of current image
+        yield Folder_Index
+
+        # Increment index
+        Counter += 1
+
+        # Check file limit
+        if Counter > Limit_Counter and (Counter % CAMERA_MODULES == 0):
+            Limit_Counter += Limit
+            Folder_Index += 1
+
+# Function to move modules sets images to their final folder, Folders is the folder indexes generator (None without files limit),
+#  images are appended to folders pack files instead if Packs (open pack files) is given
+def arrangeImages(Folder, Registry, Indexes, Output, Folders, Arranged_List, Packs=None):
+
+    # Iterate over images
+    for i in Indexes:
+
+        # Compute output directory
+        if Folders:
+            Folder_Index = next(Folders)
             OutDir = '%s/../%s' % (Output, Folder_Index)
 
             # Create output directory if not exists
-            if not os.path.isdir(OutDir):
+            if Packs is None and not os.path.isdir(OutDir):
                 os.makedirs(OutDir)
+        else:
+            Folder_Index = -1
+            OutDir = '%s/..' % (Output)
 
-            # Compute source file name
-            SourceFile = '%s/%s.jp4' % (Folder, image.path)
+        # Compute source file name
+        image = Registry.image(i)
+        SourceFile = '%s/%s.jp4' % (Folder, image.path)
 
-            # If file exists move it
-            if os.path.isfile(SourceFile):
-                shutil.move(SourceFile, '%s/%s_%d.jp4' % (OutDir, image.timestamp, image.module))
-                Arranged_List.append( JP4Image(image.timestamp, image.module, Folder_Index, -1) )
+        # Skip missing files
+        if not os.path.isfile(SourceFile):
+            continue
+
+        # Append image to folder pack file
+        if Packs is not None:
+
+            # Folders are filled one after the other, close previous pack file
+            if not Folder_Index in Packs:
+                for Pack in Packs.values():
+                    Pack.close()
+                Packs.clear()
+                Packs[Folder_Index] = PackWriter('%s/../%s' % (Output, packName(Folder_Index)))
+
+            # Move image into pack file
+            with open(SourceFile, 'rb') as Image:
+                Packs[Folder_Index].add(Registry.epoch[i], Registry.usec[i], Registry.module[i], Image.read())
+            os.remove(SourceFile)
+
+        else:
+
+            # Move file
+            shutil.move(SourceFile, '%s/%s_%d.jp4' % (OutDir, image.timestamp, image.module))
+
+        Arranged_List.appendFrame(Registry, i, -1, Folder_Index)
+
+# Function to compute the pack file name of a folder (-1 without files limit)
+def packName(Folder_Index):
+
+    # Check folder index
+    if Folder_Index != -1:
+        return "%d.pack" % Folder_Index
+
+    return "images.pack"
+
+# Function to write the index and header of a pack file, images records are (epoch, microseconds, module, offset, size)
+def writePackIndex(PackFile, Records, IndexOffset):
+
+    # Write sorted index after images
+    PackFile.seek(IndexOffset)
+    PackFile.write(''.join([struct.pack(PACK_Record, *Record) for Record in sorted(Records)]))
 
-            # Increment index
-            Counter += 1
+    # Write header
+    PackFile.seek(0)
+    PackFile.write(struct.pack(PACK_Header, PACK_Magic, len(Records), IndexOffset))
+
+# Function to create pack files of planned images (direct mode), images are written later at their offset
+def createPacks(Packs):
+
+    # Walk over pack files
+    for Path, (Records, IndexOffset) in Packs.items():
+        with open(Path, 'wb') as PackFile:
+            writePackIndex(PackFile, Records, IndexOffset)
+
+# Function to compute the merge keys (epoch, microseconds, MOV position, image position) of indexed images with EXIF data
+def frameKeys(Position, Frames):
+
+    # Iterate over MOV images
+    for Frame, (Timestamp, _Offset, Size) in enumerate(Frames):
+        if Timestamp is not None:
+            Epoch, Usec, SubSec, Digits = splitTimestamp(Timestamp)
+            yield (Epoch, Usec, Position, Frame)
+
+# Function to decide the final location of every indexed JPEG image, sets completeness and folders (direct mode)
+@timed
+def planImages(Index, Output, Trash, Limit):
+
+    # Variables to store images informations
+    Plan = {}
+    Fail = 0
+    Runs = []
+    Packs = {}
+    Arranged_List = FrameRegistry(PACK)
+
+    # Iterate over indexed MOV files
+    for Position, (MOV, Frames) in enumerate(Index):
+
+        # Initialize MOV plan
+        Plan[MOV.path] = []
+
+        # Images without EXIF data go to trash
+        for Timestamp, _Offset, Size in Frames:
+            if Timestamp is None:
+                Plan[MOV.path].append((_Offset, Size, '%s/fail_%d_exif.jp4' % (Trash, Fail)))
+                Fail += 1
+
+        # Images keys stream (epoch, microseconds, MOV position, image position), sorted if needed
+        if isOrdered(frameKeys(Position, Frames)):
+            Runs.append(frameKeys(Position, Frames))
+        else:
+            Runs.append(iter(sorted(frameKeys(Position, Frames))))
 
-            # Check file limit
-            if Counter > Limit_Counter and (Counter % CAMERA_MODULES == 0):
-                Limit_Counter += Limit
-                Folder_Index += 1
+    # Compute final location of images
+    if Limit > 0:
+        Folders = folderIndexes(Limit)
     else:
-        for image in Images:
+        Folders = None
+
+    # Walk over timestamps of merged MOV files images
+    for Stamp, Group in itertools.groupby(heapq.merge(*Runs), key=lambda Key: Key[0:2]):
+
+        # Variable to store modules set
+        Set = {}
+
+        # Insert module into set if module not exists
+        for Key in Group:
+            MOV, Frames = Index[Key[2]]
+            if not MOV.module in Set:
+                Set[MOV.module] = (MOV.path, ) + Frames[Key[3]]
+
+        # Get timestamp name
+        ts = Set.values()[0][1]
+
+        # Compute missing modules
+        Missing_Modules = [x for x in range(1, CAMERA_MODULES + 1) if not x in Set]
+
+        # Check presense of missing modules
+        if len(Missing_Modules) > 0 and NO_FILTER == 0:
+
+            # Debug output
+            if not quietEnabled():
+                ShowMessage("Incomplete timestamp %s (Missing module(s) %s)" % (ts, str(Missing_Modules)[1:-1]), 1)
+
+            # Send present modules to trash
+            for m in Set:
+                Path, Timestamp, _Offset, Size = Set[m]
+                Plan[Path].append((_Offset, Size, '%s/%s_%s.jp4' % (Trash, ts, m)))
+
+            continue
+
+        # Iterate over possible modules
+        for m in range(1, CAMERA_MODULES + 1):
+            if not m in Set:
+                continue
+
             # Compute output directory
-            OutDir = '%s/..' % (Output)
+            if Folders:
+                Folder_Index = next(Folders)
+                OutDir = '%s/%s' % (Output, Folder_Index)
+            else:
+                Folder_Index = -1
+                OutDir = Output
 
-            # Compute source file name
-            SourceFile = '%s/%s.jp4' % (Folder, image.path)
+            # Store image location
+            Path, Timestamp, _Offset, Size = Set[m]
+            Arranged_List.append(ts, m, -1, Folder_Index, _Offset, Size)
 
-            # If file exists move it
-            if os.path.isfile(SourceFile):
-                shutil.move(SourceFile, '%s/%s_%d.jp4' % (OutDir, image.timestamp, image.module))
-                Arranged_List.append( JP4Image(image.timestamp, image.module, -1, -1) )
+            # Store image location in folder pack file
+            if PACK:
+
+                # Initialize pack file (records, next image offset)
+                PackPath = '%s/%s' % (Output, packName(Folder_Index))
+                if not PackPath in Packs:
+                    Packs[PackPath] = [[], struct.calcsize(PACK_Header)]
+
+                # Store image record
+                Pack = Packs[PackPath]
+                Pack[0].append((Arranged_List.epoch[-1], Arranged_List.usec[-1], m, Pack[1], Size))
+                Plan[Path].append((_Offset, Size, '%s#%d' % (PackPath, Pack[1])))
+                Pack[1] += Size
+
+            else:
+                Plan[Path].append((_Offset, Size, '%s/%s_%d.jp4' % (OutDir, ts, m)))
+
+    # Return plan, arranged images and pack files
+    return Plan, Arranged_List, Packs
+
+# Function to get the (numerator, denominator) pairs of an EXIF rational tag
+def rationals(tag):
+
+    # Targeted EXIF reader values are already pairs
+    if not hasattr(tag, 'values'):
+        return tag
+
+    # Variable to store result
+    Result = []
+
+    # Split exifread values
+    for value in tag.values:
+        r = string.split(str(value), '/')
+
+        # Variables padding
+        if len(r) == 1:
+            r.append(1)
+
+        Result.append(r)
 
     # Return result
-    return Arranged_List
+    return Result
 
 # Function to convert a fractioned EXIF array into degrees
 def array2degrees(dms):
@@ -598,17 +2333,7 @@ def array2degrees(dms):
     _round=1000000
 
     # Splitting input values
-    d = string.split(str(dms.values[0]), '/')
-    m = string.split(str(dms.values[1]), '/')
-    s = string.split(str(dms.values[2]), '/')
-
-    # Variables padding
-    if len(d) == 1:
-        d.append(1)
-    if len(m) == 1:
-        m.append(1)
-    if len(s) == 1:
-        s.append(1)
+    d, m, s = rationals(dms)[0:3]
 
     # Compute degrees
     rslt = float(d[0]) / float(d[1]) + (float(m[0]) / float(m[1])) / 60.0 + (float(s[0]) / float(s[1])) / 3600.0
@@ -623,11 +2348,7 @@ def parseAlt(alt):
     _round=1000000
 
     # Splitting input values
-    a = string.split(str(alt), '/')
-
-    # Variables padding
-    if len(a) == 1:
-        a.append(1)
+    a = rationals(alt)[0]
 
     # Compute altitude
     rslt = float(a[0]) / float(a[1])
@@ -635,6 +2356,141 @@ def parseAlt(alt):
     # Return result
     return round(_round*rslt)/_round
 
+# Function to round scaled values like round() does (half away from zero)
+def roundArray(Values, Factor):
+
+    # Scale values
+    Scaled = Values * Factor
+
+    # Round magnitudes, exact halves go up
+    Magnitude = numpy.abs(Scaled)
+    Rounded = numpy.floor(Magnitude)
+    Rounded += (Magnitude - Rounded) >= 0.5
+
+    # Restore signs and scale back
+    return numpy.copysign(Rounded, Scaled) / Factor
+
+# Function to convert fractioned EXIF arrays (d, m, s columns) into degrees
+def arrays2degrees(Num, Den):
+
+    # Compute degrees
+    rslt = Num[:, 0] / Den[:, 0] + (Num[:, 1] / Den[:, 1]) / 60.0 + (Num[:, 2] / Den[:, 2]) / 3600.0
+
+    # Return result
+    return roundArray(rslt, 1000000)
+
+# Function to get the GPS row of an image from its EXIF tags, None without GPS data
+#  (numerators, denominators, signs, direction flag) with rationals of longitude (d, m, s),
+#  latitude (d, m, s), altitude, heading, tilt (d, m, s), roll (d, m, s) and signs of
+#  longitude, latitude, altitude, tilt, roll
+def gpsRow(EXIFData):
+
+    # Images without GPS data
+    if not 'GPS GPSLongitude' in EXIFData:
+        return None
+
+    # Tags rationals
+    Values = rationals(EXIFData['GPS GPSLongitude'])[0:3] + rationals(EXIFData['GPS GPSLatitude'])[0:3] + rationals(EXIFData['GPS GPSAltitude'])[0:1]
+
+    # Tags signs
+    Signs = [
+        -1 if (str(EXIFData['GPS GPSLongitudeRef']) == "W") else 1,
+        -1 if (str(EXIFData['GPS GPSLatitudeRef']) == "S") else 1,
+        -1 if (str(EXIFData['GPS GPSAltitudeRef']) == "S") else 1,
+        1,
+        1
+    ]
+
+    # Camera direction
+    Direction = 'GPS GPSImgDirection' in EXIFData
+
+    if Direction:
+
+        # Direction rationals
+        Values += rationals(EXIFData['GPS GPSImgDirection'])[0:1] + rationals(EXIFData['GPS GPSDestLatitude'])[0:3] + rationals(EXIFData['GPS GPSDestLongitude'])[0:3]
+
+        # Direction signs
+        Signs[3] = -1 if (str(EXIFData['GPS GPSDestLatitudeRef']) == "S") else 1
+        Signs[4] = -1 if (str(EXIFData['GPS GPSDestLongitudeRef']) == "W") else 1
+
+    else:
+
+        # Neutral direction rationals
+        Values += [(0, 1)] * 7
+
+    # Return row
+    return (tuple(int(v[0]) for v in Values), tuple(int(v[1]) for v in Values), tuple(Signs), int(Direction))
+
+# Function to compute the KML camera records (longitude, latitude, altitude, heading, tilt, roll) of GPS rows,
+#  as arrays of degrees and meters
+def gpsRecords(Rows):
+
+    # Pure python conversion without NumPy
+    if numpy is None:
+
+        # Variable to store result
+        Result = ([], [], [], [], [], [])
+
+        # Walk over rows
+        for Num, Den, Signs, Direction in Rows:
+
+            # Rationals pairs
+            r = zip(Num, Den)
+
+            # Compute GPS data
+            Result[0].append(Signs[0] * array2degrees(r[0:3]))
+            Result[1].append(Signs[1] * array2degrees(r[3:6]))
+            Result[2].append(Signs[2] * parseAlt(r[6:7]))
+
+            if Direction:
+
+                # Compute camera direction
+                Heading = parseAlt(r[7:8])
+                Tilt    = Signs[3] * array2degrees(r[8:11]) + 90.0
+
+                if (Tilt < 0):
+                    Tilt = 0
+                elif (Tilt > 180):
+                    Tilt = 180
+
+                Roll = Signs[4] * array2degrees(r[11:14])
+
+            else:
+
+                # Default camera direction
+                Heading, Tilt, Roll = 0, 90, 0
+
+            Result[3].append(Heading)
+            Result[4].append(Tilt)
+            Result[5].append(Roll)
+
+        # Return result
+        return Result
+
+    # Build arrays
+    Num       = numpy.array([row[0] for row in Rows], dtype=numpy.float64).reshape(-1, 14)
+    Den       = numpy.array([row[1] for row in Rows], dtype=numpy.float64).reshape(-1, 14)
+    Signs     = numpy.array([row[2] for row in Rows], dtype=numpy.float64).reshape(-1, 5)
+    Direction = numpy.array([row[3] for row in Rows], dtype=bool)
+
+    # Compute GPS data
+    Longitude = Signs[:, 0] * arrays2degrees(Num[:, 0:3], Den[:, 0:3])
+    Latitude  = Signs[:, 1] * arrays2degrees(Num[:, 3:6], Den[:, 3:6])
+    Altitude  = Signs[:, 2] * roundArray(Num[:, 6] / Den[:, 6], 1000000)
+
+    # Compute camera direction
+    Heading = roundArray(Num[:, 7] / Den[:, 7], 1000000)
+    Tilt    = numpy.clip(Signs[:, 3] * arrays2degrees(Num[:, 8:11], Den[:, 8:11]) + 90.0, 0, 180)
+    Roll    = Signs[:, 4] * arrays2degrees(Num[:, 11:14], Den[:, 11:14])
+
+    # Default camera direction
+    Heading = numpy.where(Direction, Heading, 0)
+    Tilt    = numpy.where(Direction, Tilt, 90)
+    Roll    = numpy.where(Direction, Roll, 0)
+
+    # Return result
+    return (Longitude, Latitude, Altitude, Heading, Tilt, Roll)
+
 # Function to convert bytes to an human readable file size
 def human_size(nbytes):
 
@@ -654,331 +2510,512 @@ def human_size(nbytes):
     # Return result
     return '%s %s' % (f, suffixes[i])
 
-# Function to generate KML file
-@timed
-def generateKML(Input, BaseURL, Results):
+# Function to get the GPS row of a JP4 file from its EXIF data
+def readPosition(ImagePath):
 
-    # Open KML file for writing
-    KML_File = open("%s/../map_points.kml" % Input, "wb")
+    # Read image from its pack file
+    if os.path.dirname(ImagePath).endswith('.pack'):
+        Pack = PackReader(os.path.dirname(ImagePath))
+        Timestamp, Module = os.path.basename(ImagePath)[:-4].rsplit('_', 1)
+        ImageData = Pack.read(Timestamp, Module)
+        Pack.close()
 
-    # Write header
-    KML_File.write(KML_Header)
+        # Images not found have no GPS data
+        if ImageData is None:
+            return None
 
-    # Build a list with only module 1
-    List = []
-    for image in Results:
-        if image.module == 1:
-            List.append("%s.jp4" % (image.path))
+    else:
 
-    if len(List) <= 0:
-        ShowMessage("Nothing to generate", 1)
-        return
+        # Read image
+        Image = open(ImagePath, "rb")
+        ImageData = Image.read()
+        Image.close()
 
-    if not quietEnabled():
-        ShowMessage("Generating %d entries..." % len(List))
+    # Compute GPS data
+    return gpsRow(frameEXIF(ImageData, True))
 
-    # Walk over files
-    for f in List:
+# Function to format a value for a CSV field
+def csvField(Value):
 
-        # Determine base path
-        BasePath = ""
+    # Quote fields containing separators or quotes
+    if ',' in Value or '"' in Value or '\n' in Value:
+        return '"%s"' % Value.replace('"', '""')
 
-        # Split base path
-        segs = f.split('/')
+    # Return field
+    return Value
 
-        # Check base path presence, and calculate apropriate result
-        if len(segs) > 1:
-            BasePath = "%s/%s/%s" % (BaseURL, segs[0], segs[1])
+# Function to write a block of map files entries
+def writeMapBlock(Input, BaseURL, Block, Positions, Pool, Files, Written):
+
+    # Images not captured during extraction
+    Missing = [image for image in Block if image.timestamp not in Positions]
+
+    # Read missing GPS data from images EXIF, in parallel
+    Records = {}
+    if Missing:
+        Paths = ["%s/%s.jp4" % (Input, image.path) for image in Missing]
+        for image, Row in zip(Missing, Pool.map(readPosition, Paths)):
+            Records[image.timestamp] = Row
+
+    # Images with GPS data and their GPS rows
+    Images = []
+    Rows = []
+
+    # Walk over block images
+    for image in Block:
+
+        # Get GPS data captured during extraction, from EXIF otherwise
+        if image.timestamp in Positions:
+            Row = Positions[image.timestamp]
         else:
-            BasePath = "%s/%s" % (BaseURL, f)
+            Row = Records[image.timestamp]
 
+        # Skip images without GPS data
+        if Row is None or Row == GPS_Missing:
+            continue
 
-        # Open image and extract EXIF data
-        Image = open("%s/%s" % (Input, f), "rb")
-        EXIFData = exifread.process_file(Image)
-        Image.close()
+        Images.append(image)
+        Rows.append(Row)
 
-        # Compute GPS data
-        Longitude = (-1 if (EXIFData['GPS GPSLongitudeRef'] == "W") else 1) * array2degrees(EXIFData['GPS GPSLongitude'])
-        Latitude  = (-1 if (EXIFData['GPS GPSLatitudeRef'] == "S") else 1)  * array2degrees(EXIFData['GPS GPSLatitude'])
-        Altitude  = (-1 if (EXIFData['GPS GPSAltitudeRef'] == "S") else 1)  * parseAlt(EXIFData['GPS GPSAltitude'])
+    # Nothing to write
+    if not Images:
+        return Written
 
-        Heading = 0
-        Tilt    = 90
-        Roll    = 0
+    # Formatted entries per map file
+    Entries = dict((Format, []) for Format in Files)
 
-        if 'GPS GPSImgDirection' in EXIFData:
+    # Convert GPS rows in a single batch
+    Columns = [list(Column) for Column in gpsRecords(Rows)]
 
-            # Compute GPS data
-            Heading = parseAlt(EXIFData['GPS GPSImgDirection'])
-            Tilt    = (-1 if (EXIFData['GPS GPSDestLatitudeRef'] == "S") else 1) * array2degrees(EXIFData['GPS GPSDestLatitude']) + 90.0
+    # Walk over images camera records
+    for image, Longitude, Latitude, Altitude, Heading, Tilt, Roll in zip(Images, *Columns):
+
+        # Format altitude
+        Altitude = "{0:.1f}".format(Altitude)
+
+        # Split base path
+        segs = ("%s.jp4" % image.path).split('/')
 
-            if (Tilt < 0):
-                Tilt = 0
-            elif (Tilt > 180):
-                Tilt = 180
+        # Check base path presence, and calculate apropriate result
+        if len(segs) > 1:
+            BasePath = "%s/%s/%s" % (BaseURL, segs[0], segs[1])
+        else:
+            BasePath = "%s/%s" % (BaseURL, segs[0])
+
+        # Format entries
+        for Format in Files:
+            if Format == "geojson":
+                Entries[Format].append(MAP_Files[Format][2] % (Longitude, Latitude, Altitude, Heading, Tilt, Roll, json.dumps(BasePath)))
+            elif Format == "csv":
+                Entries[Format].append(MAP_Files[Format][2] % (Longitude, Latitude, Altitude, Heading, Tilt, Roll, csvField(BasePath)))
+            else:
+                Entries[Format].append(MAP_Files[Format][2] % (Longitude, Latitude, Altitude, Heading, Tilt, Roll, BasePath))
 
-            Roll = (-1 if (EXIFData['GPS GPSDestLongitudeRef'] == "W") else 1) * array2degrees(EXIFData['GPS GPSDestLongitude'])
+    # Write entries as a single block per map file
+    for Format, MapFile in Files.items():
 
-        # Write KML entry
-        KML_File.write(KML_Entry % (Longitude, Latitude, "{0:.1f}".format(Altitude), Heading, Tilt, Roll, BasePath))
+        # Separate from previous entries
+        Separator = MAP_Files[Format][3]
+        if Written > 0:
+            MapFile.write(Separator)
 
-    # Write KML footer
-    KML_File.write(KML_Footer)
+        MapFile.write(Separator.join(Entries[Format]))
 
-    # Close KML file
-    KML_File.close()
+    # Return written entries count
+    return Written + len(Images)
 
-# Function to merge threads results
+# Function to generate map files (KML, GeoJSON, CSV)
 @timed
-def mergeResults(Source, Dest):
+def generateMaps(Input, BaseURL, Results, Positions, Jobs=1):
+
+    # Count module 1 images
+    Count = Results.module.count(1)
 
-    # Merge Fail counter
-    Dest[0] += Source[0]
+    if Count <= 0:
+        ShowMessage("Nothing to generate", 1)
+        return
 
-    # Merge Extracted files timestamps
-    for i in range(0, len(Source[1])):
-        Dest[2].append(Source[1][i])
+    if not quietEnabled():
+        ShowMessage("Generating %d entries..." % Count)
 
-    # Merge Extracted files count
-    Dest[3] += len(Source[1])
+    # Open map files for writing, with large buffers
+    Files = {}
+    for Format in MAP_FORMATS:
+        Files[Format] = open("%s/../map_points.%s" % (Input, MAP_Files[Format][0]), "wb", MAP_Buffer)
 
-    # Merge file limit counter
-    Dest[5] += Source[5]
+        # Write header
+        Files[Format].write(MAP_Files[Format][1])
 
-    # Merge file limit dir index
-    Dest[6] = Source[6]
+    # Create pool for EXIF reads
+    if EXECUTOR == "process":
+        Pool = createProcessPool(Jobs)
+    else:
+        Pool = ThreadPool(Jobs)
+
+    # Entries written
+    Written = 0
 
-# Function to get first available slot
-def GetSlot(Slots):
+    try:
 
-    # Iterate over slots
-    for i in range(0, len(Slots)):
+        # Walk over module 1 images by blocks
+        Block = []
+        for i in xrange(len(Results)):
+            if Results.module[i] != 1:
+                continue
 
-        # If slot is not used return it
-        if Slots[i] == 0:
-            return i
+            # Append image to current block
+            Block.append(Results.image(i))
 
-# Function to count used slots
-def UsedSlots(Slots):
+            # Write full blocks
+            if len(Block) >= MAP_Block:
+                Written = writeMapBlock(Input, BaseURL, Block, Positions, Pool, Files, Written)
+                Block = []
 
-    # Local result variable
-    ret = 0
+        # Write last block
+        if Block:
+            Written = writeMapBlock(Input, BaseURL, Block, Positions, Pool, Files, Written)
 
-    # Iterate over slots
-    for i in range(0, len(Slots)):
+    finally:
 
-        # If slot is used increment result
-        if Slots[i] == 1:
-            ret += 1
+        # Stop pool
+        Pool.close()
+        Pool.join()
 
-    # Return result
-    return ret
+    # Write footers and close map files
+    for Format, MapFile in Files.items():
+        MapFile.write(MAP_Files[Format][4])
+        MapFile.close()
 
-# MOV extraction data collector
-# pylint: disable=W0602
+# Function to merge MOV file extraction results
 @timed
-def WorkerThread_MOVCollector(Source, Dest):
+def mergeResults(Source, Dest):
 
-    # Global variables
-    global QUEUE_Done, QUEUE_Slots
+    # Merge failed images count
+    Dest[0] += Source[3]
 
-    # Infinite while
-    while QUEUE_Done != -1:
+    # Merge Extracted files count
+    Dest[1] += len(Source[0])
 
-        # Check if results queue is not empty
-        if not Source.empty():
+    # Merge GPS positions
+    if Source[1]:
+        Dest[2].update(Source[1])
 
-            # Retrieve the result
-            Ret = Source.get()
+    # Merge rejected JPEG headers count
+    Dest[3] += Source[4]
 
-            # Unlock thread slot
-            QUEUE_Slots[Ret[7]] = 0
+# Function to get a MOV file size
+def movSize(MOV):
 
-            # Merge results
-            mergeResults(Ret, Dest)
+    try:
+        return os.stat(MOV.path).st_size
+    except OSError:
+        return 0
+
+# Function to compute the expected memory footprint of a MOV job, one mapping window of the MOV file
+#  and the scanner fallback chunk buffers
+def movFootprint(MOV):
+    return min(movSize(MOV), MOV_Window + 2 * SCAN_CHUNK)
+
+# Function to compute the expected memory footprint of a MOV job reading headers only (counting, indexing),
+#  sample tables and EXIF segments are small, the scanner fallback reads one chunk at a time
+def scanFootprint(MOV):
+    return min(movSize(MOV), 2 * SCAN_CHUNK)
+
+# Function to queue MOV files for worker threads, in list order or largest first inside each time window
+#  (MOV files of the same rank in their module folder), so modules of a window are still processed together
+def queueMOVs(MOV_List):
+
+    # Variable to store queued MOV files (priority, index, MOV)
+    Queue_MOV = Queue.PriorityQueue()
+
+    # Queue all MOV files
+    for Index, MOV in enumerate(MOV_List):
+        if SCHEDULE == "size":
+            Priority = (MOV.rank, -movSize(MOV), Index)
+        else:
+            Priority = (Index,)
+        Queue_MOV.put((Priority, Index + 1, MOV))
 
-            # Increment processed MOVs index
-            QUEUE_Done  += 1
+    # Return queue
+    return Queue_MOV
 
-        # Wait 200ms
-        time.sleep(0.2)
+# Function to estimate the makespan of jobs started in a given order, from their sizes and a processing rate
+def expectedMakespan(Sizes, Workers, Rate):
 
-# MOV counting data collector
-# pylint: disable=W0602
-@timed
-def WorkerThread_CountCollector(Source, Dest):
+    # Workers finish times heap, each job goes to the first available worker
+    Finish = [0.0] * max(Workers, 1)
+    for Size in Sizes:
+        heapq.heapreplace(Finish, Finish[0] + Size / Rate)
 
-    # Global variables
-    global QUEUE_Done, QUEUE_Slots
+    # Return last finish time
+    return max(Finish)
 
-    # Infinite while
-    while QUEUE_Done != -1:
+# Worker thread, runs queued jobs until the queue is empty
+def WorkerThread_Jobs(tid, Queue_MOV, Job, Callback, Lock, Budget, Timings, Failure, Footprints):
 
-        # Check if results queue is not empty
-        if not Source.empty():
+    # Loop until all MOVs are processed
+    while True:
+
+        # Pick one MOV file, exit when there is no more work
+        try:
+            _Priority, Index, MOV = Queue_MOV.get_nowait()
+        except Queue.Empty:
+            return
 
-            # Retrieve the result
-            Ret = Source.get()
+        # Wait until MOV file fits in memory budget
+        Footprint = Footprints(MOV)
+        if DEBUG_MODE and not Budget.fits(Footprint):
+            ShowMessage("Waiting for memory budget to process %s (%s)" % (MOV.path, human_size(Footprint)), 3, 0, tid)
+        Budget.acquire(Footprint)
+
+        # Run job
+        Start = time.time()
+        try:
+            Result = Job(tid, Index, MOV)
+        except Exception, err:
+            ShowMessage("Failed to process %s (%s)" % (MOV.path, err), 2, 0, tid)
+
+            # Notify failure
+            if Failure:
+                with Lock:
+                    Failure(MOV)
+            continue
+        finally:
+            Budget.release(Footprint)
+
+            # Record job timing (start time, size, duration)
+            Timings.append((Start, Footprint, time.time() - Start))
+
+        # Merge results
+        with Lock:
+            Callback(Result)
+
+# Function to run jobs on a bounded pool of worker threads and wait for their completion
+def runJobs(Jobs, Queue_MOV, Job, Callback, Failure=None, Footprints=movFootprint):
 
-            # Unlock thread slot
-            QUEUE_Slots[Ret[2]] = 0
+    # Local variables
+    Lock = threading.Lock()
+    Budget = MemoryBudget(MAX_MEMORY)
+    Timings = []
+    Workers = []
+    Start = time.time()
+
+    # Create worker threads
+    for tid in range(0, Jobs):
+        Worker = threading.Thread(
+            target = WorkerThread_Jobs,
+            args = (tid, Queue_MOV, Job, Callback, Lock, Budget, Timings, Failure, Footprints)
+        )
 
-            Dest[0] += Ret[0]
-            Dest[1] += Ret[1]
+        # Start worker thread
+        Worker.setDaemon(True)
+        Worker.start()
+        Workers.append(Worker)
 
-            # Increment processed MOVs index
-            QUEUE_Done  += 1
+    # Wait until all workers finish (with timeout, to keep CTRL-C working)
+    for Worker in Workers:
+        while Worker.is_alive():
+            Worker.join(1)
 
-        # Wait 200ms
-        time.sleep(0.2)
+    # Compare actual makespan with the one expected from MOV sizes at the measured processing rate
+    Busy = sum([Duration for _Start, Size, Duration in Timings])
+    if DEBUG_MODE and Busy > 0:
+        Rate = sum([Size for _Start, Size, Duration in Timings]) / Busy
+        Expected = expectedMakespan([Size for _Start, Size, Duration in sorted(Timings)], Jobs, Rate)
+        ShowMessage("Makespan: %.2fs expected, %.2fs actual (%s scheduling)" % (Expected, time.time() - Start, SCHEDULE), 3)
 
 # Main thread
-# pylint: disable=W0602
 @timed
-def WorkerThread(__extractMOV_Results__, __extractMOV_Results_Template__, __countMOV_Results__, __Jobs__, __Count_Images__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__):
-
-    # Global variables
-    global QUEUE_Done, QUEUE_Slots
+def WorkerThread(__extractMOV_Results__, __extractMOV_Counters_Template__, __countMOV_Results__, __Jobs__, __Count_Images__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__, __Assembler__):
 
     # Local variables
-    __Processed_Files__ = 1
-    Threads = Queue.Queue()
-    Threads_Results = []
+    Threads_Counters = []
+    Pool = None
+
+    # Queue all MOV files
+    Queue_MOV = queueMOVs(__MOV_List_Optimized__)
+
+    # Create worker processes pool if requested
+    if EXECUTOR == "process":
+        Pool = createProcessPool(__Jobs__)
 
     # Check if in counting mode
     if __Count_Images__ == 0:
 
-        # Initialize default threads results containers
+        # Initialize default threads counters
         for i in range(0, __Jobs__):
-            Threads_Results.append(__extractMOV_Results_Template__[:])
-            QUEUE_Slots.append(0)
+            Threads_Counters.append(__extractMOV_Counters_Template__[:])
 
-        # Create collector thread
-        CollectorThread = threading.Thread(
-            target = WorkerThread_MOVCollector,
-            args = (Threads, __extractMOV_Results__)
-        )
+        # Extraction job
+        def Job(tid, Index, MOV):
+
+            # Debug output
+            ShowMessage("Extracting (%d/%d): %s..." % (Index, __Total_Files__, MOV.path))
 
-        # Start collector thread
-        CollectorThread.setDaemon(True)
-        CollectorThread.start()
+            # Extract MOV file
+            return MOV, extractMOV_Job(tid, MOV, Pool, __Output__, __Trash__, Threads_Counters[tid])
 
-        # Loop until all MOVS are extracted
-        while QUEUE_Done < __Total_Files__:
+        # Extraction completion callback
+        def Callback(Ret):
 
-            # Insert a new item to the queue if not full
-            if (UsedSlots(QUEUE_Slots) < __Jobs__) and (len(__MOV_List_Optimized__) > 0):
+            # Merge results
+            mergeResults(Ret[1], __extractMOV_Results__)
 
-                # Get an available thread slot
-                Index = GetSlot(QUEUE_Slots)
+            # Finalize modules sets of extracted images
+            __Assembler__.add(Ret[0], Ret[1][0])
 
-                # Pick one MOV file
-                MOV = __MOV_List_Optimized__[0]
+        # Extraction failure callback, a failed MOV file adds no image but must not hold back sets finalization
+        def Failure(MOV):
+            __Assembler__.add(MOV, FrameRegistry())
 
-                # Debug output
-                ShowMessage("Extracting (%d/%d): %s..." % (__Processed_Files__, __Total_Files__, MOV.path))
+        # Extraction maps a window of the MOV file
+        Footprints = movFootprint
 
-                # Issue 7980 fix
-                datetime.strptime('', '')
+    else:
 
-                # Assign thread id
-                Threads_Results[Index][7] = Index
+        # Counting job
+        def Job(tid, Index, MOV):
 
-                # Lock thread slot
-                QUEUE_Slots[Index] = 1
+            # Debug output
+            ShowMessage("Counting (%d/%d): %s..." % (Index, __Total_Files__, MOV.path))
 
-                # Compute output folder
-                Output = "%s/t%d" % (__Output__, Index)
+            # Count MOV file
+            return countMOV_Job(tid, MOV, Pool)
 
-                # Create dir if not exists
-                if not os.path.isdir(Output):
-                    os.makedirs(Output)
+        # Counting completion callback
+        def Callback(Ret):
 
-                # Create thread
-                ThreadJob = threading.Thread(
-                    target = extractMOV_Thread,
-                    args = (Index, Threads, MOV.path, Output, __Trash__, MOV.module, Threads_Results[Index])
-                )
+            # Merge results
+            __countMOV_Results__[0] += Ret[0]
+            __countMOV_Results__[1] += Ret[1]
+            __countMOV_Results__[3] += Ret[3]
 
-                # Start thread
-                ThreadJob.setDaemon(True)
-                ThreadJob.start()
+        # Counting failures need no handling
+        Failure = None
 
-                # Increment index
-                __Processed_Files__ += 1
+        # Counting reads MOV headers only
+        Footprints = scanFootprint
 
-                # Remove processed MOV file from list
-                __MOV_List_Optimized__.pop(0)
+    # Run jobs until all MOVs are processed
+    runJobs(__Jobs__, Queue_MOV, Job, Callback, Failure, Footprints)
 
-            else:
+    # Stop worker processes
+    if Pool:
+        Pool.close()
+        Pool.join()
 
-                # Wait 200ms
-                time.sleep(0.2)
+# Direct mode thread, index all MOV files then write each image once to its final location
+@timed
+def DirectThread(__Jobs__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__, Limit, __Manifest__):
 
-        # Exit threads
-        QUEUE_Done = -1
+    # Local variables
+    Index = []
+    Positions = {}
+    Stats = [0]
+    Pool = None
 
-    else:
+    # Create worker processes pool if requested
+    if EXECUTOR == "process":
+        Pool = createProcessPool(__Jobs__)
 
-        # Initialize default threads results containers
-        for i in range(0, __Jobs__):
-            QUEUE_Slots.append(0)
+    # Queue all MOV files
+    Queue_MOV = queueMOVs(__MOV_List_Optimized__)
 
-        # Create collector thread
-        CollectorThread = threading.Thread(
-            target = WorkerThread_CountCollector,
-            args = (Threads, __countMOV_Results__)
-        )
+    # Indexing job
+    def IndexJob(tid, _Index, MOV):
+
+        # Reuse index of unchanged MOV files
+        if RESUME:
+            Frames = __Manifest__.getFrames(MOV.path)
+            if Frames is not None:
+                return MOV, Frames, 0, None, 0
+
+        # Debug output
+        ShowMessage("Indexing (%d/%d): %s..." % (_Index, __Total_Files__, MOV.path))
 
-        # Start collector thread
-        CollectorThread.setDaemon(True)
-        CollectorThread.start()
+        # Index MOV file
+        Frames, MOVPositions, Rejected = callJob(Pool, indexMOV, (MOV.path, MOV.module, tid))
+        return MOV, Frames, 1, MOVPositions, Rejected
 
-        # Loop until all MOVS are extracted
-        while QUEUE_Done < __Total_Files__:
+    # Indexing completion callback
+    def IndexCallback(Ret):
 
-            # Insert a new item to the queue if not full
-            if (UsedSlots(QUEUE_Slots) < __Jobs__) and (len(__MOV_List_Optimized__) > 0):
+        # Record new MOV files index
+        if Ret[2]:
+            __Manifest__.setFrames(Ret[0].path, Ret[1])
 
-                # Get an available thread slot
-                Index = GetSlot(QUEUE_Slots)
+        # Store MOV file index
+        Index.append(Ret[0:3])
 
-                # Pick one MOV file
-                MOV = __MOV_List_Optimized__[0]
+        # Merge GPS positions
+        if Ret[3]:
+            Positions.update(Ret[3])
 
-                # Debug output
-                ShowMessage("Counting (%d/%d): %s..." % (__Processed_Files__, __Total_Files__, MOV.path))
+        # Merge rejected JPEG headers count
+        Stats[0] += Ret[4]
 
-                # Issue 7980 fix
-                datetime.strptime('', '')
+    # Index all MOV files
+    runJobs(__Jobs__, Queue_MOV, IndexJob, IndexCallback, None, scanFootprint)
 
-                # Lock thread slot
-                QUEUE_Slots[Index] = 1
+    # Debug output
+    if Stats[0] and not quietEnabled():
+        ShowMessage("%d false JPEG header(s) rejected by scanner" % Stats[0])
 
-                # Create thread
-                ThreadJob = threading.Thread(
-                    target = countMOV_Thread,
-                    args = (Threads, MOV.path, Index)
-                )
+    # Debug output
+    if RESUME and not quietEnabled():
+        ShowMessage("%d unchanged MOV file(s) not indexed again" % len([x for x in Index if not x[2]]))
 
-                # Start thread
-                ThreadJob.setDaemon(True)
-                ThreadJob.start()
+    # Decide final location of images
+    Plan, Arranged_List, Packs = planImages([x[0:2] for x in Index], __Output__, __Trash__, Limit)
 
-                # Increment index
-                __Processed_Files__ += 1
+    # Create pack files
+    createPacks(Packs)
 
-                # Remove processed MOV file from list
-                __MOV_List_Optimized__.pop(0)
+    # Queue all MOV files again
+    Queue_MOV = queueMOVs(__MOV_List_Optimized__)
 
-            else:
+    # Writing job
+    def WriteJob(tid, _Index, MOV):
 
-                # Wait 200ms
-                time.sleep(0.2)
+        # Get MOV images plan
+        MOVPlan = Plan.get(MOV.path, [])
 
-        # Exit threads
-        QUEUE_Done = -1
+        # Skip images already produced by a previous run
+        if RESUME:
+            Remaining = reuseImages(MOVPlan, __Manifest__.getOutputs(MOV.path))
+        else:
+            Remaining = MOVPlan
+
+        # Write MOV images
+        if len(Remaining) > 0:
+
+            # Debug output
+            ShowMessage("Extracting (%d/%d): %s..." % (_Index, __Total_Files__, MOV.path))
+
+            callJob(Pool, writeMOV, (MOV.path, Remaining))
+
+        # Return MOV images plan
+        return MOV, MOVPlan
+
+    # Writing completion callback
+    def WriteCallback(Ret):
+
+        # Record produced files
+        __Manifest__.setOutputs(Ret[0].path, Ret[1])
+
+    # Write all images
+    runJobs(__Jobs__, Queue_MOV, WriteJob, WriteCallback)
+
+    # Stop worker processes
+    if Pool:
+        Pool.close()
+        Pool.join()
+
+    # Count images with EXIF data
+    Extracted = sum([len([x for x in Frames if x[0] is not None]) for MOV, Frames, Indexed in Index])
+
+    # Return arranged images, extracted images count and GPS positions
+    return Arranged_List, Extracted, Positions
 
 # Usage display function
 def _usage():
@@ -996,13 +3033,23 @@ def _usage():
     -h --help           Prints this
 
     -j --jobs           Jobs count (Threads)
+    -e --executor       Jobs executor, thread or process (Default thread)
+    -b --backend        Images write backend, mmap or kernel (zero-copy, Default mmap)
     -x --modules        Number of JP4 modules (Default 9)
     -c --count          Don't extract MOV files, just count images
     -m --maxfiles       Max JP4 files per folder, will create folders 0, 1, 2, 3 to place next files
+    -w --direct         Write JP4 files directly to their final folders (no temp folder)
+    -r --resume         Skip MOV files unchanged since last direct run, recorded in <output>.db (implies --direct, not with --pack)
+    -y --indexdir       Frames index folder (Default next to MOV files)
     -k --kmlbase        KML base url
+    -p --mapformats     Map files formats, comma separated list of kml, geojson, csv (Default kml)
+    -a --pack           Write each JP4 folder as a single pack file (N.pack, images.pack without max files)
     -g --filelist       Write final JP4 paths to file
     -l --logfile        Log file path
     -f --nofilter       Don't filter images (trashing)
+    -s --chunksize      Read chunk size in KB when scanning MOV files without index (Default 16384)
+    -z --max-memory     Memory budget in MB, MOV files are extracted while their footprints (mapping window, scanner buffers) fit in it (Default no limit)
+    -v --schedule       MOV files scheduling, order or size (largest first in each time window, Default order)
 
     -d --debug          Debug mode
     -q --quiet          Quiet mode (Silent)
@@ -1027,6 +3074,8 @@ def main(argv):
     __Max_Files__    = 0
     __FileList__     = ""
     __KMLBase__      = "__BASE__URL__"
+    __Direct__       = 0
+    __Manifest__     = None
 
     # Scope variables initialisation
     __Exec_Timer__         = time.clock()
@@ -1036,26 +3085,27 @@ def main(argv):
     __countMOV_Results__ = [
         0, # Images count
         0, # Total images size
-        0  # Thread id
+        0, # Thread id
+        0  # Rejected JPEG headers count
     ]
-    __extractMOV_Results_Template__ = [
+    __extractMOV_Counters_Template__ = [
         0,  # Fail counter
-        [], # Last extracted files timestamps
-        [], # Extracted files timestamps
         0,  # Extracted files count
         0,  # File limit value
         0,  # File limit counter
         0,  # File limit dir index
         0   # Thread id
     ]
-
-    __extractMOV_Results__ = __extractMOV_Results_Template__[:]
-
-    __Filtered_Images__ = []
+    __extractMOV_Results__ = [
+        0,  # Failed images count
+        0,  # Extracted files count
+        {}, # GPS positions of first module images
+        0   # Rejected JPEG headers count
+    ]
 
     # Arguments parser
     try:
-        opt, args = getopt.getopt(argv, "hf:i:o:t:k:g:j:x:cm:dql:nf", ["help", "folder=", "input=", "output=", "trash=", "kmlbase=", "filelist=", "jobs=", "modules=", "count", "maxfiles=", "debug", "quiet", "logfile=", "nocolors", "nofilter"])
+        opt, args = getopt.getopt(argv, "hf:i:o:t:k:p:ag:j:e:b:x:cm:wry:dql:nfs:z:v:", ["help", "folder=", "input=", "output=", "trash=", "kmlbase=", "mapformats=", "pack", "filelist=", "jobs=", "executor=", "backend=", "modules=", "count", "maxfiles=", "direct", "resume", "indexdir=", "debug", "quiet", "logfile=", "nocolors", "nofilter", "chunksize=", "max-memory=", "schedule="])
         args = args
     except getopt.GetoptError, err:
         print str(err)
@@ -1075,16 +3125,37 @@ def main(argv):
             __Trash__  = a.rstrip('/')
         elif o in ("-j", "--jobs"):
             __Jobs__ = int(a)
+        elif o in ("-e", "--executor"):
+            global EXECUTOR
+            EXECUTOR = a
+        elif o in ("-b", "--backend"):
+            global BACKEND
+            BACKEND = a
         elif o in ("-x", "--modules"):
             CAMERA_MODULES = int(a)
         elif o in ("-c", "--count"):
             __Count_Images__ = 1
         elif o in ("-m", "--maxfiles"):
             __Max_Files__  = int(a)
-            __extractMOV_Results_Template__[4] = __Max_Files__
-            __extractMOV_Results_Template__[5] = __Max_Files__
+            __extractMOV_Counters_Template__[2] = __Max_Files__
+            __extractMOV_Counters_Template__[3] = __Max_Files__
+        elif o in ("-w", "--direct"):
+            __Direct__ = 1
+        elif o in ("-r", "--resume"):
+            global RESUME
+            RESUME = 1
+            __Direct__ = 1
+        elif o in ("-y", "--indexdir"):
+            global INDEX_DIR
+            INDEX_DIR = a.rstrip('/')
         elif o in ("-k", "--kmlbase"):
             __KMLBase__  = a.rstrip('/')
+        elif o in ("-p", "--mapformats"):
+            global MAP_FORMATS
+            MAP_FORMATS = a.split(',')
+        elif o in ("-a", "--pack"):
+            global PACK
+            PACK = 1
         elif o in ("-g", "--filelist"):
             __FileList__ = a
         elif o in ("-d", "--debug"):
@@ -1102,6 +3173,15 @@ def main(argv):
         elif o in ("-f", "--nofilter"):
             global NO_FILTER
             NO_FILTER  = 1
+        elif o in ("-s", "--chunksize"):
+            global SCAN_CHUNK
+            SCAN_CHUNK = int(a) * 1024
+        elif o in ("-z", "--max-memory"):
+            global MAX_MEMORY
+            MAX_MEMORY = int(a) * 1024 * 1024
+        elif o in ("-v", "--schedule"):
+            global SCHEDULE
+            SCHEDULE = a
         else:
             assert False, "unhandled option"
 
@@ -1136,8 +3216,31 @@ def main(argv):
             _usage()
             return
 
+    if not EXECUTOR in ("thread", "process"):
+        _usage()
+        return
+
+    if not BACKEND in ("mmap", "kernel"):
+        _usage()
+        return
+
+    if not SCHEDULE in ("order", "size"):
+        _usage()
+        return
+
+    # Pack files are rewritten by every run, their images cannot be reused
+    if RESUME and PACK:
+        ShowMessage("Resume is not available with pack files", 2)
+        return
+
+    for Format in MAP_FORMATS:
+        if not Format in MAP_Files:
+            _usage()
+            return
+
     # Append temp folder to output path
-    __Output__ = ("%s/temp" % __Output__)
+    if not __Direct__:
+        __Output__ = ("%s/temp" % __Output__)
 
     # Create default directories
     if __Output__ and not os.path.isdir(__Output__):
@@ -1149,6 +3252,9 @@ def main(argv):
     if __Trash__ and not os.path.isdir(__Trash__):
         os.makedirs(__Trash__)
 
+    if INDEX_DIR and not os.path.isdir(INDEX_DIR):
+        os.makedirs(INDEX_DIR)
+
     # Get modules from input folder
     CameraModules = sorted(os.listdir(__Input__))
 
@@ -1163,16 +3269,13 @@ def main(argv):
             Movs.append( MovFile(MOV, mn) )
         __MOV_List__.append(Movs)
 
-    # Sort MOV files
-    while len(__MOV_List__) > 0:
+    # Sort MOV files, one MOV file of each module per time window (rank)
+    for Rank in range(0, max([len(MovArray) for MovArray in __MOV_List__] or [0])):
         for MovArray in __MOV_List__:
-            for MOV in MovArray:
-                __MOV_List_Optimized__.append(MOV)
+            if Rank < len(MovArray):
+                MovArray[Rank].rank = Rank
+                __MOV_List_Optimized__.append(MovArray[Rank])
                 __Total_Files__ += 1
-                MovArray.pop(0)
-                break
-        if len(__MOV_List__[0]) <= 0:
-            __MOV_List__.pop(0)
 
     # Debug output
     if not quietEnabled():
@@ -1186,59 +3289,60 @@ def main(argv):
     if __Total_Files__ == 0:
         ShowMessage("No MOV files", 2)
 
-    #Create main thread
-    MainThread = threading.Thread(
-        target = WorkerThread,
-        args = (__extractMOV_Results__, __extractMOV_Results_Template__, __countMOV_Results__, __Jobs__, __Count_Images__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__)
-    )
+    # Compute files limit per folder
+    Limit = -1
+    if __Max_Files__ != 0:
 
-    # Start main thread
-    MainThread.setDaemon(True)
-    MainThread.start()
+        # Clamp max files to 9
+        if __Max_Files__ < CAMERA_MODULES:
+            __Max_Files__ = CAMERA_MODULES
 
-    # Wait until main thread finishes
-    while MainThread.is_alive():
-        time.sleep(0.5)
+        # Convert limit to a power of 9
+        Limit = (__Max_Files__ / CAMERA_MODULES) * CAMERA_MODULES
 
-    # Check presence of count mode
-    if __Count_Images__ == 0:
+    # Check presence of direct mode
+    if __Count_Images__ == 0 and __Direct__:
+
+        # Open processing manifest, stored next to the output folder so that it is not mixed with images
+        __Manifest__ = Manifest("%s.db" % os.path.normpath(__Output__))
+
+        # Extract images directly to their final location, returns when all jobs are done
+        __Aranged_Images__, __Extracted__, __Positions__ = DirectThread(__Jobs__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__, Limit, __Manifest__)
+
+        # Close processing manifest
+        __Manifest__.close()
 
         # Debug output
         if not quietEnabled():
-            ShowMessage("Extraction done, %d image(s) extracted" % __extractMOV_Results__[3])
-
-        # Filter check
-        if not quietEnabled() and NO_FILTER == 0:
-            # Debug output
-            ShowMessage("Filtering images...")
+            ShowMessage("Extraction done, %d image(s) extracted" % __Extracted__)
 
-            # Start image filtering
-            __Filtered_Images__ = filterImages(__Output__, __Trash__, __extractMOV_Results__)
+    else:
 
-        # Check presence of max files option
-        if __Max_Files__ != 0:
+        # Create modules sets assembler, images leave temp folder during extraction
+        __Assembler__ = None
+        if __Count_Images__ == 0:
+            __Assembler__ = SetAssembler(__MOV_List_Optimized__, __Output__, __Output__, __Trash__, Limit)
 
-            # Clamp max files to 9
-            if __Max_Files__ < CAMERA_MODULES:
-                __Max_Files__ = CAMERA_MODULES
+        # Process all MOV files, returns when all jobs are done
+        WorkerThread(__extractMOV_Results__, __extractMOV_Counters_Template__, __countMOV_Results__, __Jobs__, __Count_Images__, __Total_Files__, __MOV_List_Optimized__, __Output__, __Trash__, __Assembler__)
 
-            # Convert limit to a power of 9
-            Limit = (__Max_Files__ / CAMERA_MODULES) * CAMERA_MODULES
+    # Check presence of count mode
+    if __Count_Images__ == 0:
 
-            # Debug output
-            if not quietEnabled():
-                ShowMessage("Rearranging images...")
+        # Remaining images still need to be moved out of temp folder
+        if not __Direct__:
 
-            # Rearrange images
-            __Aranged_Images__ = rearrangeImages(__Output__, __Filtered_Images__, __Output__, Limit)
-        else:
+            # Finalize remaining modules sets
+            __Assembler__.flush()
+            __Aranged_Images__ = __Assembler__.arranged
 
             # Debug output
             if not quietEnabled():
-                ShowMessage("Rearranging images...")
+                ShowMessage("Extraction done, %d image(s) extracted" % __extractMOV_Results__[1])
 
-            # Rearrange images
-            __Aranged_Images__ = rearrangeImages(__Output__, __Filtered_Images__, __Output__, -1)
+                # Scanner statistics
+                if __extractMOV_Results__[3]:
+                    ShowMessage("%d false JPEG header(s) rejected by scanner" % __extractMOV_Results__[3])
 
         # Check if filelist option is specified
         if __FileList__:
@@ -1248,13 +3352,16 @@ def main(argv):
 
         # Debug output
         if not quietEnabled():
-            ShowMessage("Starting KML file generation...")
+            ShowMessage("Starting map files generation...")
 
-        # Generate KML file
-        generateKML('%s/..' % __Output__, __KMLBase__, __Aranged_Images__)
+        # Generate map files
+        if __Direct__:
+            generateMaps(__Output__, __KMLBase__, __Aranged_Images__, __Positions__, __Jobs__)
+        else:
+            generateMaps('%s/..' % __Output__, __KMLBase__, __Aranged_Images__, __extractMOV_Results__[2], __Jobs__)
 
-        # Remove temp folder
-        shutil.rmtree(__Output__)
+            # Remove temp folder
+            shutil.rmtree(__Output__)
 
     else:
 
@@ -1263,6 +3370,10 @@ def main(argv):
             ShowMessage("Total images: %d" % __countMOV_Results__[0])
             ShowMessage("Total size: %s" % human_size(__countMOV_Results__[1]))
 
+            # Scanner statistics
+            if __countMOV_Results__[3]:
+                ShowMessage("Rejected JPEG headers: %d" % __countMOV_Results__[3])
+
     # Debug output
     if not quietEnabled():
         Delay = (time.clock() - __Exec_Timer__)